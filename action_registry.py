@@ -0,0 +1,196 @@
+"""
+Command actions declared in commands.json.
+
+A command entry may carry an "action" object naming what it does, e.g.
+
+    "!bubbles": {..., "action": {"type": "ha_service", "service": "button/press",
+                                 "entity_id": "button.esphome_web_13e1fc_bubble_burst"}}
+    "!desk":    {..., "action": {"type": "desk", "min": 58, "max": 123}}
+    "!party":   {..., "action": {"type": "led", "leds": "1,2,3", "colour": "#ff00ff", "duration": 5}}
+    "!hello":   {..., "action": {"type": "tts", "text": "{user} says hello"}}
+
+Sound commands (!sound_<name>) and the built-in commands in DEFAULT_ACTIONS
+need no "action". Every spec is validated and compiled once when the
+commands document is loaded, so dispatch is a dict lookup.
+"""
+import re
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+import homeassistant_controls
+import plaque_board_controller
+import tts_module
+from homeassistant_controls import (
+    BUBBLES_ENTITY_ID,
+    PISTON_DOWN_ENTITY_ID,
+    PISTON_UP_ENTITY_ID,
+    adjust_desk_height,
+)
+from sound_board import play_sound
+
+SOUND_PREFIX = "!sound_"
+
+DEFAULT_ACTIONS: Dict[str, Dict[str, Any]] = {
+    "!bubbles": {
+        "type": "ha_service",
+        "service": "button/press",
+        "entity_id": BUBBLES_ENTITY_ID,
+        "message": "Turning on the bubble machine...",
+    },
+    "!piston_up": {
+        "type": "ha_service",
+        "service": "button/press",
+        "entity_id": PISTON_UP_ENTITY_ID,
+        "message": "Moving piston to top...",
+    },
+    "!piston_down": {
+        "type": "ha_service",
+        "service": "button/press",
+        "entity_id": PISTON_DOWN_ENTITY_ID,
+        "message": "Setting piston to bottom (zero)...",
+    },
+    "!desk": {"type": "desk", "min": 58, "max": 123},
+}
+
+
+class SoundAction(NamedTuple):
+    sound: str
+
+    def run(self, match, display_name):
+        print(f"Attempting to play sound: {self.sound}")
+        play_sound(self.sound)
+
+
+class HaServiceAction(NamedTuple):
+    service: str
+    data: dict
+    message: Optional[str]
+
+    def run(self, match, display_name):
+        if self.message:
+            print(self.message)
+        homeassistant_controls.call_ha_service_async(self.service, dict(self.data))
+
+
+class DeskAction(NamedTuple):
+    pattern: "re.Pattern[str]"
+    minimum: int
+    maximum: int
+
+    def run(self, match, display_name):
+        height_match = self.pattern.match(match.text)
+        if not height_match:
+            print("No valid height specified for desk command.")
+            return
+        desired_height = int(height_match.group(1))
+        if self.minimum <= desired_height <= self.maximum:
+            print(f"Adjusting desk to height: {desired_height} cm")
+            adjust_desk_height(desired_height)
+        else:
+            print(f"Desired height {desired_height} is out of range. Must be between {self.minimum} and {self.maximum} cm.")
+
+
+class LedAction(NamedTuple):
+    key: str
+    compiled: Optional[plaque_board_controller.CompiledPlaque]  # None lights the sender's plaque
+    duration: float
+
+    def run(self, match, display_name):
+        if self.compiled is None:
+            plaque_board_controller.set_leds_for_user(display_name, self.duration)
+            return
+        compiled = self.compiled
+        plaque_board_controller.compositor.highlight(
+            self.key, compiled.indices, compiled.hex_colour, self.duration, compiled.payload
+        )
+
+
+class TtsAction(NamedTuple):
+    text: str
+    newtts: bool
+
+    def run(self, match, display_name):
+        tts_module.gotts(
+            self.text.format(user=display_name, args=match.args),
+            self.newtts,
+            user=display_name,
+        )
+
+
+def _desk_action(name, spec):
+    # Heights may be glued to the command ("!desk80", "!desk_80")
+    pattern = spec.get("pattern") or rf"{re.escape(name)}[_\s]*(\d+)"
+    compiled = re.compile(pattern)
+    if compiled.groups < 1:
+        raise ValueError("desk pattern needs a group capturing the height")
+    return DeskAction(compiled, int(spec.get("min", 58)), int(spec.get("max", 123)))
+
+
+def _ha_service_action(name, spec):
+    service = spec["service"]
+    if "/" not in service:
+        raise ValueError(f"service must look like 'domain/service', got {service!r}")
+    data = dict(spec.get("data") or {})
+    if "entity_id" in spec:
+        data["entity_id"] = spec["entity_id"]
+    return HaServiceAction(service, data, spec.get("message"))
+
+
+def _led_action(name, spec):
+    duration = float(spec.get("duration", 5))
+    if spec.get("leds"):
+        compiled = plaque_board_controller.compile_plaque(str(spec["leds"]), spec.get("colour", "#FFFFFF"))
+        return LedAction(name, compiled, duration)
+    return LedAction(name, None, duration)
+
+
+def _tts_action(name, spec):
+    text = spec["text"]
+    text.format(user="", args="")  # reject unknown placeholders now, not mid-stream
+    return TtsAction(text, bool(spec.get("newtts", True)))
+
+
+ACTION_TYPES = {
+    "sound": lambda name, spec: SoundAction(spec.get("sound") or name[len(SOUND_PREFIX):]),
+    "ha_service": _ha_service_action,
+    "desk": _desk_action,
+    "led": _led_action,
+    "tts": _tts_action,
+}
+
+
+def parse_action(name: str, spec: Mapping[str, Any]):
+    """Compile one action spec; raises ValueError if it is malformed."""
+    kind = spec.get("type")
+    factory = ACTION_TYPES.get(kind)
+    if factory is None:
+        raise ValueError(f"unknown action type {kind!r}")
+    try:
+        return factory(name, spec)
+    except (KeyError, IndexError, TypeError, re.error) as e:
+        raise ValueError(f"bad {kind} action: {e}") from e
+
+
+class ActionRegistry:
+    """Compiled actions for every command in a commands document."""
+
+    def __init__(self, commands: Mapping[str, Mapping[str, Any]]):
+        self._actions: Dict[str, Any] = {}
+        for name, details in commands.items():
+            spec = details.get("action") if isinstance(details, Mapping) else None
+            if spec is None:
+                spec = DEFAULT_ACTIONS.get(name)
+            if spec is None and name.startswith(SOUND_PREFIX):
+                spec = {"type": "sound"}
+            if spec is None:
+                continue
+            try:
+                self._actions[name] = parse_action(name, spec)
+            except ValueError as e:
+                print(f"Ignoring action for command {name}: {e}")
+
+    def get(self, name: str):
+        return self._actions.get(name)
+
+    def prefix_commands(self):
+        """Commands whose argument may be glued onto the name."""
+        return {name for name, action in self._actions.items() if isinstance(action, DeskAction)}
@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# A step runs `delay` seconds after the previous step of the same sequence
+Step = Tuple[float, Callable[..., object], tuple]
+
+LATENCY_WINDOW = 200
+
+
+class ActuatorScheduler:
+    """
+    Run timed multi-step device sequences from one timer thread.
+    Each device has at most one live sequence: scheduling a new one for the
+    same device cancels the steps the previous one had not run yet, so a
+    burst of requests ends at the latest target. Steps are handed to
+    `dispatch` (the Home Assistant worker by default) and never sleep.
+    """
+
+    def __init__(self, dispatch: Optional[Callable[..., None]] = None, clock=time.monotonic):
+        self._dispatch = dispatch
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._heap: List[tuple] = []
+        self._order = itertools.count()
+        self._live: Dict[str, int] = {}  # device -> id of its current sequence
+        self._thread = None
+        self._lateness = deque(maxlen=LATENCY_WINDOW)
+        self.counters: Counter = Counter()
+
+    def schedule(self, device: str, steps: Sequence[Step]) -> int:
+        """Replace the device's pending sequence with steps; returns the sequence id."""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="actuators", daemon=True)
+                self._thread.start()
+            sequence = next(self._order)
+            if device in self._live:
+                self.counters["superseded"] += 1
+            self._live[device] = sequence
+            due = self._clock()
+            for delay, func, args in steps:
+                due += delay
+                heapq.heappush(self._heap, (due, next(self._order), device, sequence, func, args))
+            self.counters["sequences"] += 1
+            self._cond.notify()
+            return sequence
+
+    def is_active(self, device: str) -> bool:
+        with self._cond:
+            return device in self._live
+
+    def cancel(self, device: str) -> None:
+        with self._cond:
+            if self._live.pop(device, None) is not None:
+                self.counters["cancelled"] += 1
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    # Steps of cancelled or superseded sequences are skipped here
+                    while self._heap and self._live.get(self._heap[0][2]) != self._heap[0][3]:
+                        heapq.heappop(self._heap)
+                        self.counters["steps_dropped"] += 1
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    wait = self._heap[0][0] - self._clock()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                due, _, device, sequence, func, args = heapq.heappop(self._heap)
+                self._lateness.append(self._clock() - due)
+                if not any(entry[2] == device and entry[3] == sequence for entry in self._heap):
+                    del self._live[device]  # that was the sequence's last step
+                self.counters["steps_run"] += 1
+            try:
+                if self._dispatch is None:
+                    func(*args)
+                else:
+                    self._dispatch(func, *args)
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"Error running {device} step: {e}")
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            stats: Dict[str, object] = dict(self.counters)
+            stats["pending_steps"] = sum(
+                1 for entry in self._heap if self._live.get(entry[2]) == entry[3]
+            )
+            stats["active_devices"] = sorted(self._live)
+            lateness = sorted(self._lateness)
+            if lateness:
+                stats["lateness_p50_ms"] = round(lateness[len(lateness) // 2] * 1000, 1)
+                stats["lateness_max_ms"] = round(lateness[-1] * 1000, 1)
+            return stats
@@ -1,8 +1,9 @@
 from flask import Flask, request, render_template, redirect, url_for, jsonify
 from pathlib import Path
 import csv
-from plaque_board_controller import set_leds
+import plaque_board_controller
 import commandhandler
+import homeassistant_controls
 import tts_module
 from storage import (
     load_commands,
@@ -12,6 +13,7 @@ from storage import (
     load_plaques,
     save_plaques,
     update_plaque,
+    find_plaque,
 )
 from youtube_utils import verify_youtube_keys
 
@@ -43,7 +45,7 @@ def manage_secrets():
             return "Twitch"
         if key in {"api_key", "api_key_backup", "channel_id", "video_id"}:
             return "YouTube"
-        if key in {"access_token", "ha_url"}:
+        if key in {"access_token", "ha_url", "ha_transport"}:
             return "Home Assistant"
         if key == "board_ip":
             return "Hardware"
@@ -95,7 +97,8 @@ def manage_commands():
         'manage_commands.html',
         grouped_commands=grouped,
         category_order=category_order,
-        access_levels=get_access_levels()
+        access_levels=get_access_levels(),
+        rate_limit_stats=commandhandler.rate_limiter.stats(),
     )
 
 
@@ -130,9 +133,9 @@ def get_access_levels():
 @app.route('/test_commands', methods=['POST'])
 def test_commands():
     command_input = request.form['command_input']
-    commands = load_commands()
-    if command_input in commands:
-        commandhandler.execute_command(command_input, "Test User")
+    match = commandhandler.match_command(command_input)
+    if match:
+        commandhandler.execute_command(match, "Test User")
     else:
         print(f"Command '{command_input}' not recognized.")
     return redirect(url_for('manage_commands'))
@@ -170,8 +173,20 @@ def pause_tts():
 
 @app.route('/tts_status', methods=['GET'])
 def tts_status():
-    return jsonify({"paused": tts_module.is_paused()})
+    return jsonify({
+        "paused": tts_module.is_paused(),
+        "queue": tts_module.queue_stats(),
+        "cache": tts_module.cache_stats(),
+    })
+
+
 
+@app.route('/ha_status', methods=['GET'])
+def ha_status():
+    return jsonify({
+        "client": homeassistant_controls.ha_client.stats(),
+        "actuators": homeassistant_controls.actuators.stats(),
+    })
 
 
 @app.route("/editor", methods=["GET", "POST"])
@@ -181,6 +196,7 @@ def editor():
         leds_colour = request.form["Leds_colour"]
         leds = request.form["Leds"]
         update_plaque(yt_name, leds_colour, leds)
+        plaque_board_controller.invalidate_plaque(yt_name)
         return redirect(url_for("editor"))
     
     data = load_plaques()
@@ -203,6 +219,8 @@ def edit():
             entry["Leds"] = leds
             break
     save_plaques(data)
+    plaque_board_controller.invalidate_plaque(original_yt_name)
+    plaque_board_controller.invalidate_plaque(yt_name)
 
     return redirect(url_for("editor"))
 
@@ -216,6 +234,7 @@ def delete():
 
     # Save the updated data back to the JSON file
     save_plaques(data)
+    plaque_board_controller.invalidate_plaque(yt_name)
 
     return jsonify({"status": "success"})
 
@@ -223,36 +242,19 @@ def delete():
 def trigger_leds():
     try:
         print("DEBUG: trigger_leds endpoint called")
-        plaques = load_plaques()
-        if plaques:
-            print(f"DEBUG: Loaded {len(plaques)} plaques from file")
-        else:
-            print("DEBUG: No plaques file found")
-
         data = request.json
         yt_name = data.get('YT_Name')
         duration = data.get('time', 3)
         print(f"DEBUG: Searching for user: {yt_name}, duration: {duration}")
-        
-        matching_plaque = None
-        for plaque in plaques:
-            plaque_name = plaque.get('YT_Name')
-            print(f"DEBUG: Checking plaque with YT_Name: {plaque_name}")
-            if plaque_name and plaque_name.lower() == yt_name.lower():
-                matching_plaque = plaque
-                print("DEBUG: Found matching plaque!")
-                break
-        
+
+        # Indexed lookup; the plaque's LEDs and colour are already compiled
+        matching_plaque = find_plaque(yt_name or "")
+
         if matching_plaque:
-            color = matching_plaque.get('Leds_colour', '#FFFFFF')
-            color = color.lstrip('#')
-            r, g, b = tuple(int(color[i:i+2], 16) for i in (0, 2, 4))
-            
-            leds = matching_plaque.get('Leds', '')
-            print(f"DEBUG: Attempting to trigger LEDs - Color: #{color}, Leds: {leds}")
-            
+            print(f"DEBUG: Attempting to trigger LEDs - Color: {matching_plaque.get('Leds_colour')}, Leds: {matching_plaque.get('Leds')}")
+
             try:
-                set_leds(leds, (r, g, b), duration)
+                plaque_board_controller.trigger_plaque(matching_plaque, duration)
                 print("DEBUG: LED control successful")
                 return jsonify({"status": "success"})
             except Exception as e:
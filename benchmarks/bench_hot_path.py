@@ -0,0 +1,299 @@
+"""
+Benchmark the chat-to-action hot path.
+
+Fires synthetic YouTube and Twitch message streams through main.handle_message
+at fixed rates, with TTS, sound, Home Assistant and WLED replaced by counting
+stubs, and writes the results to JSON so runs can be compared across versions.
+
+    python benchmarks/bench_hot_path.py --rates 200,1000 --plaques 10,5000
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import action_registry  # noqa: E402
+import commandhandler  # noqa: E402
+import homeassistant_controls  # noqa: E402
+import main  # noqa: E402
+import plaque_board_controller  # noqa: E402
+import storage  # noqa: E402
+from pipeline import ChatPipeline  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+CHAT_LINES = [
+    "hello from the benchmark",
+    "what are you building today?",
+    "lol",
+    "that print looks great",
+    "can you show the plaque board again",
+]
+
+
+class SinkCounters:
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def hit(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+
+class _StubHomeAssistant:
+    def __init__(self, sinks):
+        self._sinks = sinks
+
+    def call_service(self, service, data):
+        self._sinks.hit("ha")
+        return True
+
+    def submit(self, func, *args):
+        self._sinks.hit("ha")
+
+    def state(self, entity_id):
+        return None
+
+
+def install_stubs(sinks):
+    """Replace every side-effecting sink with a counter."""
+    main.gotts = lambda text, newtts=True, **kwargs: sinks.hit("tts")
+    main.say_chat = lambda display_name, text, tier="regular": sinks.hit("tts")
+    action_registry.play_sound = lambda name: sinks.hit("sound")
+    homeassistant_controls.ha_client = _StubHomeAssistant(sinks)
+    plaque_board_controller.compositor._send = lambda endpoint, payload: sinks.hit("wled") or True
+
+
+def write_fixtures(directory, command_count, plaque_count, seed):
+    """Point storage at synthetic commands, sounds and plaques in directory."""
+    rng = random.Random(seed)
+    sounds = directory / "sounds"
+    sounds.mkdir()
+    for index in range(command_count):
+        (sounds / f"bench{index}.mp3").touch()
+
+    plaques = [
+        {
+            "YT_Name": f"supporter{index}",
+            "twitchusername": f"twitch_supporter{index}",
+            "Leds_colour": f"#{rng.randrange(0x1000000):06x}",
+            "Leds": ",".join(str(rng.randrange(600)) for _ in range(rng.randint(4, 30))),
+        }
+        for index in range(plaque_count)
+    ]
+
+    storage.SOUNDS_PATH = sounds
+    storage.COMMANDS_PATH = directory / "commands.json"
+    storage.PLAQUES_PATH = directory / "plaques.json"
+    storage.SECRETS_PATH = directory / "secrets.json"
+    storage.save_secrets({"board_ip": "http://127.0.0.1:9"})
+    storage.save_plaques(plaques)
+    storage.save_commands({
+        "!bubbles": {"enabled": True, "timeout": 10, "access_level": "regular"},
+        "!desk": {"enabled": True, "timeout": 10, "access_level": "patreon"},
+    })
+    storage.flush_pending()
+    storage.invalidate_cache()
+    return storage.cached_commands(), plaques
+
+
+def message_stream(rng, source, command_names, plaque_count):
+    """Yield (display_name, text, is_superchat) for one synthetic chat source."""
+    sequence = 0
+    while True:
+        sequence += 1
+        if plaque_count and rng.random() < 0.3:
+            index = rng.randrange(plaque_count)
+            name = f"supporter{index}" if source == "youtube" else f"twitch_supporter{index}"
+        else:
+            name = f"{source}_viewer{rng.randrange(5000)}"
+
+        roll = rng.random()
+        if roll < 0.2:
+            text = rng.choice(command_names)
+        elif roll < 0.3:
+            text = f"!dec {rng.choice(CHAT_LINES)}"
+        else:
+            text = rng.choice(CHAT_LINES)
+        is_superchat = source == "youtube" and rng.random() < 0.01
+        # A unique suffix lets the router find each message's send timestamp
+        yield name, f"{text} #{source}{sequence}", is_superchat
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_once(rate, duration, command_count, plaque_count, seed):
+    sinks = SinkCounters()
+    install_stubs(sinks)
+    commandhandler.rate_limiter = RateLimiter()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        commands, _ = write_fixtures(Path(tmp), command_count, plaque_count, seed)
+        command_names = sorted(commands)
+
+        sent_at = {}
+        end_to_end = []
+        route_times = []
+        lock = threading.Lock()
+
+        def timed_router(display_name, text, is_superchat):
+            started = time.perf_counter()
+            actions = main.route_message(display_name, text, is_superchat)
+            finished = time.perf_counter()
+            with lock:
+                route_times.append(finished - started)
+                submitted = sent_at.pop((display_name, text), None)
+                if submitted is not None:
+                    end_to_end.append(finished - submitted)
+            return actions
+
+        main.chat_pipeline = ChatPipeline(timed_router)
+        main.chat_pipeline.start()
+
+        threads_before = threading.active_count()
+        threads_peak = threads_before
+        tracemalloc.start()
+        alloc_before = tracemalloc.get_traced_memory()[0]
+
+        def produce(source, share):
+            rng = random.Random(f"{seed}-{source}")
+            stream = message_stream(rng, source, command_names, plaque_count)
+            interval = 1.0 / (rate * share)
+            deadline = time.perf_counter() + duration
+            next_send = time.perf_counter()
+            while next_send < deadline:
+                name, text, is_superchat = next(stream)
+                with lock:
+                    sent_at[(name, text)] = time.perf_counter()
+                main.handle_message(name, text, is_superchat)
+                next_send += interval
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+        producers = [
+            threading.Thread(target=produce, args=("youtube", 0.6)),
+            threading.Thread(target=produce, args=("twitch", 0.4)),
+        ]
+        started = time.perf_counter()
+        for producer in producers:
+            producer.start()
+        while any(producer.is_alive() for producer in producers):
+            threads_peak = max(threads_peak, threading.active_count())
+            time.sleep(0.05)
+        for producer in producers:
+            producer.join()
+
+        # Let the pipeline drain before reading the counters
+        drain_deadline = time.perf_counter() + 5
+        while time.perf_counter() < drain_deadline:
+            stats = main.chat_pipeline.stats()
+            if not any(value for key, value in stats.items() if key.startswith("depth_")):
+                break
+            threads_peak = max(threads_peak, threading.active_count())
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        alloc_after, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = main.chat_pipeline.stats()
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "rate": rate,
+        "duration": duration,
+        "commands": len(command_names),
+        "plaques": plaque_count,
+        "sent": stats.get("received", 0),
+        "routed": stats.get("routed", 0),
+        "messages_per_sec": round(stats.get("routed", 0) / elapsed, 1),
+        "latency_p50_ms": ms(percentile(end_to_end, 0.50)),
+        "latency_p99_ms": ms(percentile(end_to_end, 0.99)),
+        "route_p50_ms": ms(percentile(route_times, 0.50)),
+        "route_p99_ms": ms(percentile(route_times, 0.99)),
+        "alloc_net_kb": round((alloc_after - alloc_before) / 1024, 1),
+        "alloc_peak_kb": round(alloc_peak / 1024, 1),
+        "threads_before": threads_before,
+        "threads_peak": threads_peak,
+        "sinks": dict(sinks.counts),
+        "pipeline": stats,
+        "storage_cache": storage.cache_stats(),
+    }
+
+
+def _git_version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the chat-to-action hot path.")
+    parser.add_argument("--rates", type=_int_list, default=[100, 500, 2000], help="messages/sec, comma separated")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument("--commands", type=_int_list, default=[20, 200], help="synthetic sound command counts")
+    parser.add_argument("--plaques", type=_int_list, default=[10, 5000], help="synthetic plaque counts")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, default=None, help="JSON file to write")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own log output")
+    args = parser.parse_args()
+
+    runs = []
+    for command_count in args.commands:
+        for plaque_count in args.plaques:
+            for rate in args.rates:
+                with open(os.devnull, "w") as devnull:
+                    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+                    with quiet:
+                        result = run_once(rate, args.duration, command_count, plaque_count, args.seed)
+                runs.append(result)
+                print(
+                    f"commands={result['commands']:>4} plaques={plaque_count:>5} rate={rate:>5}/s "
+                    f"-> {result['messages_per_sec']:>8}/s  p50={result['latency_p50_ms']}ms "
+                    f"p99={result['latency_p99_ms']}ms  threads={result['threads_peak']}"
+                )
+
+    report = {
+        "version": _git_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": runs,
+    }
+    output = args.output or RESULTS_DIR / f"hot_path-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=4), encoding="utf-8")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main_cli()
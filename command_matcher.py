@@ -0,0 +1,54 @@
+from typing import Dict, Iterable, NamedTuple, Optional
+
+
+# Commands whose arguments may be glued straight onto the name, e.g. "!desk80"
+# or "!desk_80". Every other command must be followed by whitespace or the end
+# of the message to match.
+PREFIX_COMMANDS = frozenset({"!desk"})
+
+_END = "\0"  # trie key marking that a complete command ends at this node
+
+
+class CommandMatch(NamedTuple):
+    base_command: str
+    args: str
+    text: str
+
+
+class CommandMatcher:
+    """
+    Character trie over the configured command names.
+    Matching walks the message once from its first character, so the cost is
+    bounded by the longest command name rather than commands x message length.
+    """
+
+    def __init__(self, command_names: Iterable[str], prefix_commands: Iterable[str] = PREFIX_COMMANDS):
+        self._root: Dict[str, dict] = {}
+        self._prefix_commands = frozenset(prefix_commands)
+        for name in command_names:
+            self._insert(name.lower())
+
+    def _insert(self, name: str) -> None:
+        node = self._root
+        for char in name:
+            node = node.setdefault(char, {})
+        node[_END] = name
+
+    def match(self, text: str) -> Optional[CommandMatch]:
+        """Return the longest command at the start of the text, or None."""
+        text = text.strip().lower()
+        node = self._root
+        best: Optional[CommandMatch] = None
+        for position, char in enumerate(text):
+            node = node.get(char)
+            if node is None:
+                break
+            name = node.get(_END)
+            if name is None:
+                continue
+            rest = text[position + 1:]
+            if not rest or rest[0].isspace():
+                best = CommandMatch(name, rest.strip(), text)
+            elif name in self._prefix_commands:
+                best = CommandMatch(name, rest.lstrip("_ ").strip(), text)
+        return best
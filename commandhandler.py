@@ -1,9 +1,7 @@
-import re
-import time
-
-from homeassistant_controls import Bubbles, PistonDown, PistonUp, adjust_desk_height
-from sound_board import play_sound
-from storage import load_commands, load_plaques
+from action_registry import ActionRegistry
+from command_matcher import PREFIX_COMMANDS, CommandMatcher
+from rate_limiter import RateLimiter, limits_from_config
+from storage import cached_commands, cached_plaques, cached_secrets, find_plaque
 
 access_hierarchy = ["regular", "patreon", "superchat"]
 
@@ -27,98 +25,98 @@ def get_access_levels():
         "superchat": 3,
     }
 
-# Tracking command execution times
-last_executed = {}
-
-# Function to execute a command
-def execute_command(command, display_name, is_superchat=False):
-    commands = load_commands()
-    user_access_level = get_user_access_level(display_name, is_superchat)
-
-    command = command.strip().lower()
-
-    if command.startswith('!desk'):
-        base_command = '!desk'
-    else:
-        base_command = command.split()[0]  # Get the command without arguments
+# Global, per-command, per-user and per-tier budgets for command execution
+rate_limiter = RateLimiter()
+_limits_source = None
+
+def _refresh_rate_limits():
+    # Budgets can be tuned with a "rate_limits" section in secrets.json
+    global _limits_source
+    secrets = cached_secrets()
+    if secrets is not _limits_source:
+        rate_limiter.configure(limits_from_config(secrets.get("rate_limits")))
+        _limits_source = secrets
+
+# Compiled matcher and actions, rebuilt whenever storage hands back a new commands document
+_matcher = None
+_registry = None
+_compiled_source = None
+
+def _compile_commands():
+    global _matcher, _registry, _compiled_source
+    commands = cached_commands()
+    if _matcher is None or commands is not _compiled_source:
+        registry = ActionRegistry(commands)
+        _matcher = CommandMatcher(commands.keys(), PREFIX_COMMANDS | registry.prefix_commands())
+        _registry = registry
+        _compiled_source = commands
+    return _matcher, _registry
+
+def get_matcher():
+    return _compile_commands()[0]
+
+def get_registry():
+    return _compile_commands()[1]
+
+# Function to parse a chat message into base command and arguments
+def match_command(text):
+    return get_matcher().match(text)
+
+# Function to check whether a command may run; does no I/O so spam is cheap to reject
+def authorize_command(match, display_name, user_access_level):
+    commands = cached_commands()
+    command = match.text
+    base_command = match.base_command
 
     # Check if the base command exists in commands.json
-    if base_command in commands and commands[base_command]['enabled']:
-        command_details = commands[base_command]
-
-        # Access level check
-        required_access_level = command_details['access_level']
-        if get_access_levels()[user_access_level] < get_access_levels()[required_access_level]:
-            print(f"User {display_name} does not have the required access level ({user_access_level}) for command {command} (requires {required_access_level}).")
-            return
-
-        # Timeout check
-        current_time = time.time()
-        if base_command in last_executed:
-            time_elapsed = current_time - last_executed[base_command]
-            if time_elapsed < command_details['timeout']:
-                print(f"Command {command} is on timeout for {display_name}. Please wait {command_details['timeout'] - time_elapsed:.2f} seconds.")
-                return
-
-        # Execute the command
-        print(f"Executing command {command} from {display_name}")
-        perform_command_action(command, display_name)
-        last_executed[base_command] = current_time
-    else:
+    if base_command not in commands or not commands[base_command]['enabled']:
         print(f"Command '{command}' is not enabled or does not exist.")
+        return False
+    command_details = commands[base_command]
+
+    # Access level check
+    required_access_level = command_details['access_level']
+    if get_access_levels()[user_access_level] < get_access_levels()[required_access_level]:
+        print(f"User {display_name} does not have the required access level ({user_access_level}) for command {command} (requires {required_access_level}).")
+        return False
+
+    # Rate limit check (the command's timeout is its per-command budget)
+    _refresh_rate_limits()
+    decision = rate_limiter.acquire(
+        base_command, command_details['timeout'], display_name, user_access_level
+    )
+    if not decision.allowed:
+        print(f"Command {command} is rate limited ({decision.scope}) for {display_name}. Please wait {decision.retry_after:.2f} seconds.")
+        return False
+    return True
+
+# Function to execute a command
+def execute_command(match, display_name, is_superchat=False, user_access_level=None):
+    if user_access_level is None:
+        user_access_level = get_user_access_level(display_name, is_superchat)
+
+    if authorize_command(match, display_name, user_access_level):
+        print(f"Executing command {match.text} from {display_name}")
+        perform_command_action(match, display_name)
 
 # Function to perform the command action (like playing a sound or controlling devices)
-def perform_command_action(command, displayname):
-    if command.startswith("!sound_"):
-        sound_name = command.split("!sound_")[1]
-        sound_name = sound_name.lower()
-        print(f"Attempting to play sound: {sound_name}")
-        play_sound(sound_name)
-    elif command == "!bubbles":
-        Bubbles()
-    #elif command == "!celebrate":
-    #    if displayname == 'pyrohouz':
-    #        Birthdaypopper()
-    #elif command == "!blow":
-    #    if displayname == 'pyrohouz':
-    #        Birthdaycandle()
-    elif command.startswith("!desk"):
-        try:
-            # Remove the command part and extract the number
-            match = re.match(r'!desk[_\s]*(\d+)', command)
-            if match:
-                desired_height = int(match.group(1))
-            else:
-                print("No valid height specified for desk command.")
-                return
-            if 58 <= desired_height <= 123:
-                print(f"Adjusting desk to height: {desired_height} cm")
-                adjust_desk_height(desired_height)
-            else:
-                print(f"Desired height {desired_height} is out of range. Must be between 71 and 120 cm.")
-        except ValueError:
-            print(f"Invalid desk height specified in command: {command}")
-    elif command == "!piston_up":
-        PistonUp()
-    elif command == "!piston_down":
-        PistonDown()
-    else:
-        print(f"No action defined for command: {command}")
+def perform_command_action(match, displayname):
+    action = get_registry().get(match.base_command)
+    if action is None:
+        print(f"No action defined for command: {match.base_command}")
+        return
+    action.run(match, displayname)
 
 def load_supporters():
-    return load_plaques()
+    return cached_plaques()
 
-# Function to get user access level
-def get_user_access_level(display_name, is_superchat=False):
+# Function to get the access level for an already looked-up plaque
+def access_level_for_plaque(plaque, is_superchat=False):
     if is_superchat:  # Bypass for superchat if desired
         return "superchat"
+    return "patreon" if plaque else "regular"
 
-    display_name_lower = display_name.lower()
-    supporters = load_supporters()
-    for supporter in supporters:
-        # Check against both keys. If a second username was added, include it.
-        yt_name = supporter.get("YT_Name", "").lower()
-        twitchusername = supporter.get("twitchusername", "").lower()
-        if display_name_lower in (yt_name, twitchusername):
-            return "patreon"
-    return "regular"
+# Function to get user access level
+def get_user_access_level(display_name, is_superchat=False):
+    # find_plaque checks both YT_Name and twitchusername via the name index
+    return access_level_for_plaque(find_plaque(display_name), is_superchat)
@@ -0,0 +1,91 @@
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Hashable, Set
+
+DEFAULT_ID_WINDOW = 5000  # several full liveChatMessages pages of history
+
+
+class RecentIdWindow:
+    """
+    Ring-buffered set of the most recent message IDs.
+    Memory stays constant for the whole stream: once the window is full the
+    oldest ID is forgotten for every new one. Membership is exact, so the
+    false-positive rate is always zero; the trade-off is that an ID older than
+    the window would be accepted again, which nextPageToken already prevents.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_ID_WINDOW):
+        self.capacity = capacity
+        self._order: Deque[Hashable] = deque()
+        self._members: Set[Hashable] = set()
+        self.duplicates = 0
+        self.evictions = 0
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._members
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def add(self, item: Hashable) -> bool:
+        """Remember item; return False if it was already in the window."""
+        if item in self._members:
+            self.duplicates += 1
+            return False
+        if len(self._order) >= self.capacity:
+            self._members.discard(self._order.popleft())
+            self.evictions += 1
+        self._order.append(item)
+        self._members.add(item)
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "size": len(self._members),
+            "capacity": self.capacity,
+            "duplicates": self.duplicates,
+            "evictions": self.evictions,
+            "false_positive_rate": 0.0,
+        }
+
+
+DEFAULT_CROSS_POST_TTL = 15.0  # seconds a message counts as a possible cross-post
+DEFAULT_KEY_WINDOW = 2000
+
+
+class CrossSourceWindow:
+    """
+    Remember recent (author, text) pairs and the source they arrived from.
+    A pair seen again from a different source inside the TTL is treated as
+    the same message cross-posted to several chats. Repeats on the same
+    source are left alone. Entries expire by age and by a size cap.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_CROSS_POST_TTL, capacity: int = DEFAULT_KEY_WINDOW):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries: "OrderedDict[Hashable, tuple[float, str]]" = OrderedDict()
+        self.duplicates = 0
+
+    @staticmethod
+    def key(display_name: str, text: str) -> Hashable:
+        return display_name.casefold(), " ".join(text.casefold().split())
+
+    def is_cross_post(self, display_name: str, text: str, source: str, now: float) -> bool:
+        """Record the message and return True if another source already sent it."""
+        while self._entries:
+            oldest_key, (seen_at, _) = next(iter(self._entries.items()))
+            if now - seen_at < self.ttl and len(self._entries) < self.capacity:
+                break
+            del self._entries[oldest_key]
+
+        key = self.key(display_name, text)
+        previous = self._entries.get(key)
+        if previous is not None and previous[1] != source:
+            self.duplicates += 1
+            return True
+        self._entries[key] = (now, source)
+        self._entries.move_to_end(key)
+        return False
+
+    def stats(self) -> Dict[str, float]:
+        return {"size": len(self._entries), "cross_posts": self.duplicates}
@@ -0,0 +1,263 @@
+"""
+Stand-in Home Assistant server for running the bot without real devices.
+
+Point "ha_url" in secrets.json at the printed URL (any access_token works
+unless one is passed with --token) and every service call is logged and
+answered the way Home Assistant's REST API would. The WebSocket API is
+served at /api/websocket too (auth, subscribe_events, get_states and
+call_service), with entity states updated by the services that are called.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import struct
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class FakeHomeAssistant(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, token=None, states=None):
+        super().__init__(address, _Handler)
+        self.token = token
+        self.calls = []
+        self.calls_lock = threading.Lock()
+        self.states = {}
+        self.subscribers = []  # (connection, subscription id)
+        for entity_id, value in (states or {}).items():
+            self.states[entity_id] = _state(entity_id, value)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def apply_service(self, service, data):
+        """Record a service call and update the state of the entity it targets."""
+        with self.calls_lock:
+            self.calls.append((service, data))
+            entity_ids = data.get("entity_id") or []
+            if isinstance(entity_ids, str):
+                entity_ids = [entity_ids]
+            changes = []
+            for entity_id in entity_ids:
+                value = _service_state(service, data)
+                if value is None:
+                    continue
+                old_state = self.states.get(entity_id)
+                new_state = _state(entity_id, value)
+                self.states[entity_id] = new_state
+                changes.append({"entity_id": entity_id, "old_state": old_state, "new_state": new_state})
+            subscribers = list(self.subscribers)
+        print(f"[fake HA] {service} {data}")
+
+        for change in changes:
+            for connection, subscription in subscribers:
+                connection.send_json({
+                    "id": subscription,
+                    "type": "event",
+                    "event": {"event_type": "state_changed", "data": change},
+                })
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _state(entity_id, value):
+    return {"entity_id": entity_id, "state": str(value), "attributes": {}, "last_changed": _now()}
+
+
+def _service_state(service, data):
+    """State an entity ends up in after service, or None if it doesn't change."""
+    if service == "number/set_value":
+        return float(data.get("value"))
+    if service == "button/press":
+        return _now()
+    if service in ("switch/turn_on", "light/turn_on"):
+        return "on"
+    if service in ("switch/turn_off", "light/turn_off"):
+        return "off"
+    if service == "cover/stop_cover":
+        return "stopped"
+    return None
+
+
+class _WebSocketConnection:
+    """Minimal server side of RFC 6455 over the handler's socket files."""
+
+    def __init__(self, rfile, wfile):
+        self._rfile = rfile
+        self._wfile = wfile
+        self._lock = threading.Lock()
+
+    def _send_frame(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        elif len(payload) < 1 << 16:
+            header += bytes([126]) + struct.pack("!H", len(payload))
+        else:
+            header += bytes([127]) + struct.pack("!Q", len(payload))
+        with self._lock:
+            self._wfile.write(header + payload)
+
+    def send_json(self, message):
+        try:
+            self._send_frame(0x1, json.dumps(message).encode("utf-8"))
+        except OSError:
+            pass  # client went away; its read loop cleans up
+
+    def recv_json(self):
+        """Return the next text message decoded, or None once the client closes."""
+        while True:
+            head = self._rfile.read(2)
+            if len(head) < 2:
+                return None
+            opcode = head[0] & 0x0F
+            length = head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self._rfile.read(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self._rfile.read(8))[0]
+            mask = self._rfile.read(4) if head[1] & 0x80 else b"\0\0\0\0"
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._rfile.read(length)))
+            if opcode == 0x8:  # close
+                self._send_frame(0x8, b"")
+                return None
+            if opcode == 0x9:  # ping
+                self._send_frame(0xA, payload)
+                continue
+            if opcode == 0x1:
+                return json.loads(payload.decode("utf-8"))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeHomeAssistant
+
+    def _authorized(self):
+        if self.server.token is None:
+            return True
+        return self.headers.get("Authorization") == f"Bearer {self.server.token}"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/api/websocket" and self.headers.get("Upgrade", "").lower() == "websocket":
+            self._serve_websocket()
+            return
+        if not self._authorized():
+            self._send_json(401, {"message": "Unauthorized"})
+        elif self.path.rstrip("/") == "/api":
+            self._send_json(200, {"message": "API running."})
+        else:
+            self._send_json(404, {"message": "Not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            self._send_json(401, {"message": "Unauthorized"})
+            return
+        prefix = "/api/services/"
+        if not self.path.startswith(prefix):
+            self._send_json(404, {"message": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        data = json.loads(self.rfile.read(length) or b"{}")
+        self.server.apply_service(self.path[len(prefix):], data)
+        self._send_json(200, [])
+
+    def _serve_websocket(self):
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+        self.wfile.write(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept.encode("ascii") + b"\r\n\r\n"
+        )
+        self.close_connection = True
+        connection = _WebSocketConnection(self.rfile, self.wfile)
+
+        connection.send_json({"type": "auth_required", "ha_version": "fake"})
+        auth = connection.recv_json()
+        if not auth or auth.get("type") != "auth" or (
+            self.server.token is not None and auth.get("access_token") != self.server.token
+        ):
+            connection.send_json({"type": "auth_invalid", "message": "Invalid access token"})
+            return
+        connection.send_json({"type": "auth_ok", "ha_version": "fake"})
+
+        try:
+            while True:
+                message = connection.recv_json()
+                if message is None:
+                    return
+                connection.send_json(self._websocket_reply(connection, message))
+        finally:
+            with self.server.calls_lock:
+                self.server.subscribers = [
+                    entry for entry in self.server.subscribers if entry[0] is not connection
+                ]
+
+    def _websocket_reply(self, connection, message):
+        message_id = message.get("id")
+        kind = message.get("type")
+        if kind == "ping":
+            return {"id": message_id, "type": "pong"}
+        if kind == "subscribe_events":
+            if message.get("event_type") in (None, "state_changed"):
+                with self.server.calls_lock:
+                    self.server.subscribers.append((connection, message_id))
+            return {"id": message_id, "type": "result", "success": True, "result": None}
+        if kind == "get_states":
+            with self.server.calls_lock:
+                states = list(self.server.states.values())
+            return {"id": message_id, "type": "result", "success": True, "result": states}
+        if kind == "call_service":
+            service = f"{message.get('domain')}/{message.get('service')}"
+            self.server.apply_service(service, message.get("service_data") or {})
+            return {"id": message_id, "type": "result", "success": True, "result": {"context": {}}}
+        return {
+            "id": message_id,
+            "type": "result",
+            "success": False,
+            "error": {"code": "unknown_command", "message": f"Unknown command {kind}"},
+        }
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_server(host="127.0.0.1", port=0, token=None, states=None):
+    """Start the fake server on a background thread and return it."""
+    server = FakeHomeAssistant((host, port), token=token, states=states)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--token", default=None)
+    parser.add_argument(
+        "--state", action="append", default=[], metavar="ENTITY=VALUE",
+        help="initial entity state, e.g. number.esphome_web_fdf034_desk_height=80",
+    )
+    args = parser.parse_args()
+
+    states = dict(item.split("=", 1) for item in args.state)
+    server = FakeHomeAssistant((args.host, args.port), token=args.token, states=states)
+    print(f"Fake Home Assistant listening on {server.url}")
+    server.serve_forever()
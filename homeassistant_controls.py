@@ -1,68 +1,261 @@
-import requests
+import queue
+import threading
 import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
 
-from storage import load_secrets
+from actuator_scheduler import ActuatorScheduler
+from homeassistant_ws import HomeAssistantWebSocket, HomeAssistantWebSocketError, WebSocketNotSent
+from storage import cached_secrets
 
+REQUEST_TIMEOUT = 10  # seconds
+POOL_SIZE = 4
+TIMING_WINDOW = 200  # number of recent calls kept for latency stats
 
-def _get_connection_details():
-    secrets = load_secrets()
-    access_token = secrets.get("access_token")
-    ha_url = secrets.get("ha_url")
-    if not access_token or not ha_url:
-        raise RuntimeError("Home Assistant credentials are missing from secrets.json.")
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-    }
-    return ha_url, headers
+DESK_STOP_ENTITY_ID = "over.esphome_web_fdf034_desk"
+DESK_HEIGHT_ENTITY_ID = "number.esphome_web_fdf034_desk_height"
+DESK_SETTLE = 1.0  # seconds between desk steps
+DESK_PASSES = 2  # the controller sometimes ignores a set sent right after a stop
+DESK_VERIFY_DELAY = 20.0  # seconds after a set before a tracked desk's height is checked
 
-def call_ha_service(service, data):
-    ha_url, headers = _get_connection_details()
-    url = f"{ha_url}/api/services/{service}"
-    response = requests.post(url, headers=headers, json=data, timeout=10)
-    if response.status_code == 200:
-        print(f"Service '{service}' called successfully.")
-    else:
+BUBBLES_ENTITY_ID = "button.esphome_web_13e1fc_bubble_burst"
+PISTON_DOWN_ENTITY_ID = "button.piston_move_down"
+PISTON_UP_ENTITY_ID = "button.piston_go_to_top"
+
+# Entities whose state is tracked when the WebSocket transport is enabled
+WATCHED_ENTITIES = (
+    DESK_STOP_ENTITY_ID,
+    DESK_HEIGHT_ENTITY_ID,
+    BUBBLES_ENTITY_ID,
+    PISTON_DOWN_ENTITY_ID,
+    PISTON_UP_ENTITY_ID,
+)
+
+
+class HomeAssistantClient:
+    """
+    Home Assistant REST client with a pooled keep-alive session.
+    Credentials are cached until secrets.json changes, every call is timed,
+    and slow device sequences can be pushed onto a background worker queue.
+    With "ha_transport": "websocket" in secrets.json, services are called
+    over one WebSocket connection instead (REST remains the fallback) and
+    entity states become available through state().
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT):
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._secrets_source = None
+        self._ha_url = None
+        self._ws = None
+        self._lock = threading.Lock()
+        self._timings = deque(maxlen=TIMING_WINDOW)
+        self._errors = 0
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def _connection_details(self):
+        secrets = cached_secrets()
+        with self._lock:
+            if secrets is not self._secrets_source:
+                access_token = secrets.get("access_token")
+                ha_url = secrets.get("ha_url")
+                if not access_token or not ha_url:
+                    raise RuntimeError("Home Assistant credentials are missing from secrets.json.")
+                self._session.headers.update({
+                    "Authorization": f"Bearer {access_token}",
+                    "Content-Type": "application/json",
+                })
+                self._ha_url = ha_url.rstrip("/")
+                if self._ws is not None:
+                    self._ws.close()
+                self._ws = None
+                if secrets.get("ha_transport") == "websocket":
+                    self._ws = HomeAssistantWebSocket(self._ha_url, access_token, WATCHED_ENTITIES)
+                    self._ws.start()
+                self._secrets_source = secrets
+            return self._ha_url
+
+    def call_service(self, service, data):
+        ha_url = self._connection_details()
+        ws = self._ws
+        if ws is not None:
+            started = time.perf_counter()
+            try:
+                if ws.call_service(service, data):
+                    print(f"Service '{service}' called successfully.")
+                    return True
+                self._errors += 1
+                return False
+            except WebSocketNotSent as e:
+                print(f"WebSocket call '{service}' not sent ({e}); using REST.")
+            except HomeAssistantWebSocketError as e:
+                # It may already have run, so a REST retry could fire it twice
+                self._errors += 1
+                print(f"No reply to WebSocket call '{service}' ({e}); not retrying.")
+                return False
+            finally:
+                self._timings.append(time.perf_counter() - started)
+
+        url = f"{ha_url}/api/services/{service}"
+        started = time.perf_counter()
+        try:
+            response = self._session.post(url, json=data, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            self._errors += 1
+            print(f"Error calling service '{service}': {e}")
+            return False
+        finally:
+            self._timings.append(time.perf_counter() - started)
+        if response.status_code == 200:
+            print(f"Service '{service}' called successfully.")
+            return True
+        self._errors += 1
         print(f"Error calling service '{service}': {response.text}")
+        return False
+
+    def submit(self, func, *args):
+        """Run func(*args) on the background HA worker, in submission order."""
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run_queue, name="homeassistant", daemon=True
+                )
+                self._worker.start()
+        self._queue.put((func, args))
+
+    def _run_queue(self):
+        while True:
+            func, args = self._queue.get()
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error running Home Assistant task: {e}")
+            finally:
+                self._queue.task_done()
+
+    def state(self, entity_id):
+        """
+        Cached state dict of a watched entity. None without the WebSocket
+        transport or while it is still connecting; never blocks on the network.
+        """
+        try:
+            self._connection_details()
+        except RuntimeError:
+            return None
+        ws = self._ws
+        return ws.state(entity_id) if ws is not None else None
+
+    def stats(self):
+        timings = sorted(self._timings)
+        ws = self._ws
+        stats = {
+            "calls": len(timings),
+            "errors": self._errors,
+            "queued": self._queue.qsize(),
+            "transport": "websocket" if ws is not None else "rest",
+        }
+        if ws is not None:
+            stats["websocket_connected"] = ws.connected
+        if timings:
+            stats["p50_ms"] = round(timings[len(timings) // 2] * 1000, 1)
+            stats["max_ms"] = round(timings[-1] * 1000, 1)
+        return stats
+
+
+ha_client = HomeAssistantClient()
+
+
+def call_ha_service(service, data):
+    return ha_client.call_service(service, data)
+
+
+def call_ha_service_async(service, data):
+    ha_client.submit(ha_client.call_service, service, data)
+
+
+def _submit_to_ha(func, *args):
+    ha_client.submit(func, *args)
+
+
+# Timed device sequences; their steps run in order on the HA worker
+actuators = ActuatorScheduler(dispatch=_submit_to_ha)
 
 def Bubbles():
-    entity_id = 'button.esphome_web_13e1fc_bubble_burst'
+    entity_id = BUBBLES_ENTITY_ID
     print("Turning on the bubble machine...")
-    call_ha_service('button/press', {"entity_id": entity_id})
+    call_ha_service_async('button/press', {"entity_id": entity_id})
 
 def Birthdaypopper():
     entity_id = 'switch.happpy_bday_celebrate'
     print("Turning on the celebrate machine...")
-    call_ha_service('switch/turn_on', {"entity_id": entity_id})
+    call_ha_service_async('switch/turn_on', {"entity_id": entity_id})
 
 def Birthdaycandle():
     entity_id = 'switch.happpy_bday_blow'
     print("Turning on the blow machine...")
-    call_ha_service('switch/turn_on', {"entity_id": entity_id})
+    call_ha_service_async('switch/turn_on', {"entity_id": entity_id})
 
-def adjust_desk_height(desired_height):
-    STOP_ENTITY_ID = "over.esphome_web_fdf034_desk"
-    SET_HEIGHT_ENTITY_ID = "number.esphome_web_fdf034_desk_height"
+def _stop_desk():
+    print("Stopping the desk...")
+    call_ha_service('cover/stop_cover', {"entity_id": DESK_STOP_ENTITY_ID})
 
-    def control_desk(stop_entity_id, set_height_entity_id, height):
-        print("Stopping the desk...")
-        call_ha_service('cover/stop_cover', {"entity_id": stop_entity_id})
-        time.sleep(1)  # Wait for a moment before setting the height
+def desk_at_height(height):
+    """True when the cached desk height state already equals height."""
+    state = ha_client.state(DESK_HEIGHT_ENTITY_ID)
+    try:
+        return state is not None and float(state["state"]) == float(height)
+    except (KeyError, TypeError, ValueError):
+        return False  # "unknown"/"unavailable" states
 
-        print("Setting the desk height...")
-        call_ha_service('number/set_value', {"entity_id": set_height_entity_id, "value": height})
+def _set_desk_height(height):
+    if desk_at_height(height):
+        print(f"Desk already at {height} cm; skipping set.")
+        return
+    print("Setting the desk height...")
+    call_ha_service('number/set_value', {"entity_id": DESK_HEIGHT_ENTITY_ID, "value": height})
 
-    # Call the control_desk function twice with a 1-second sleep between the calls
-    control_desk(STOP_ENTITY_ID, SET_HEIGHT_ENTITY_ID, desired_height)
-    time.sleep(1)
-    control_desk(STOP_ENTITY_ID, SET_HEIGHT_ENTITY_ID, desired_height)
+def _verify_desk_height(height, passes_left):
+    if desk_at_height(height):
+        return
+    tracked = ha_client.state(DESK_HEIGHT_ENTITY_ID) is not None
+    print(f"Desk did not reach {height} cm; sending the height again.")
+    actuators.schedule("desk", _desk_steps(height, passes_left, tracked))
+
+def _desk_steps(height, passes, verified=False):
+    """
+    stop, wait, set height; repeated `passes` times one DESK_SETTLE apart.
+    With verified, only the first pass is sent and the rest follow only if
+    the tracked height still differs DESK_VERIFY_DELAY later.
+    """
+    steps = []
+    for desk_pass in range(1 if verified else passes):
+        steps.append((DESK_SETTLE if desk_pass else 0.0, _stop_desk, ()))
+        steps.append((DESK_SETTLE, _set_desk_height, (height,)))
+    if verified and passes > 1:
+        steps.append((DESK_VERIFY_DELAY, _verify_desk_height, (height, passes - 1)))
+    return steps
+
+def adjust_desk_height(desired_height):
+    # While another sequence runs the desk is moving, so its height proves nothing
+    if not actuators.is_active("desk") and desk_at_height(desired_height):
+        print(f"Desk already at {desired_height} cm; nothing to do.")
+        return
+    # A newer !desk replaces whatever is left of this sequence
+    verified = ha_client.state(DESK_HEIGHT_ENTITY_ID) is not None
+    actuators.schedule("desk", _desk_steps(desired_height, DESK_PASSES, verified))
 
 def PistonDown():
-    entity_id = 'button.piston_move_down'
+    entity_id = PISTON_DOWN_ENTITY_ID
     print("Setting piston to bottom (zero)...")
-    call_ha_service('button/press', {"entity_id": entity_id})
+    call_ha_service_async('button/press', {"entity_id": entity_id})
 
 def PistonUp():
-    entity_id = 'button.piston_go_to_top'
+    entity_id = PISTON_UP_ENTITY_ID
     print("Moving piston to top...")
-    call_ha_service('button/press', {"entity_id": entity_id})
+    call_ha_service_async('button/press', {"entity_id": entity_id})
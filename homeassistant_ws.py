@@ -0,0 +1,225 @@
+import itertools
+import json
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+try:
+    import websocket  # websocket-client; only needed for "ha_transport": "websocket"
+except ImportError:
+    websocket = None
+
+CONNECT_TIMEOUT = 10  # seconds
+RESULT_TIMEOUT = 10  # seconds to wait for a call_service result
+RECONNECT_BACKOFF = 5.0  # seconds between connection attempts
+
+
+class HomeAssistantWebSocketError(Exception):
+    """A request was sent but no usable reply came back."""
+
+
+class WebSocketNotSent(HomeAssistantWebSocketError):
+    """The request never left this process, so another transport may retry it."""
+
+
+def websocket_url(ha_url: str) -> str:
+    """Turn the REST base URL from secrets.json into the WebSocket API URL."""
+    base = ha_url.rstrip("/")
+    if base.startswith("https://"):
+        base = "wss://" + base[len("https://"):]
+    elif base.startswith("http://"):
+        base = "ws://" + base[len("http://"):]
+    return f"{base}/api/websocket"
+
+
+class HomeAssistantWebSocket:
+    """
+    One authenticated connection to Home Assistant's WebSocket API.
+    Services are called over it with call_service messages, and state_changed
+    events for the watched entities keep an in-memory state cache current.
+    The connection is opened and reopened on its own thread, so callers never
+    wait for Home Assistant to come back.
+    """
+
+    def __init__(self, ha_url: str, access_token: str, entities: Iterable[str] = ()):
+        self.url = websocket_url(ha_url)
+        self._token = access_token
+        self._entities = set(entities)
+        self._ws = None
+        self._ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._pending: Dict[int, list] = {}  # message id -> [Event, result message]
+        self._states: Dict[str, dict] = {}
+        self._states_lock = threading.Lock()
+        self._connector = None
+        self._closed = False
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None
+
+    def start(self) -> None:
+        """Connect in the background unless connected or already trying."""
+        with self._connect_lock:
+            if self._closed or self._ws is not None:
+                return
+            if self._connector is not None and self._connector.is_alive():
+                return
+            self._connector = threading.Thread(
+                target=self._connect_loop, name="homeassistant-ws-connect", daemon=True
+            )
+            self._connector.start()
+
+    def _connect_loop(self) -> None:
+        reported = False
+        while not self._closed:
+            try:
+                self._connect()
+                return
+            except HomeAssistantWebSocketError as e:
+                if not reported:
+                    print(f"Home Assistant WebSocket unavailable ({e}); retrying every {RECONNECT_BACKOFF:.0f}s.")
+                    reported = True
+            if websocket is None:
+                return
+            time.sleep(RECONNECT_BACKOFF)
+
+    def _connect(self) -> None:
+        with self._connect_lock:
+            if self._ws is not None:
+                return
+            if websocket is None:
+                raise HomeAssistantWebSocketError("websocket-client is not installed")
+
+            try:
+                ws = websocket.create_connection(self.url, timeout=CONNECT_TIMEOUT)
+                greeting = json.loads(ws.recv())
+                if greeting.get("type") == "auth_required":
+                    ws.send(json.dumps({"type": "auth", "access_token": self._token}))
+                    greeting = json.loads(ws.recv())
+                if greeting.get("type") != "auth_ok":
+                    ws.close()
+                    raise HomeAssistantWebSocketError(f"authentication failed: {greeting.get('message', greeting)}")
+                ws.settimeout(None)
+            except HomeAssistantWebSocketError:
+                raise
+            except Exception as e:
+                raise HomeAssistantWebSocketError(f"cannot connect to {self.url}: {e}") from e
+
+            self._ws = ws
+            threading.Thread(target=self._read_loop, args=(ws,), name="homeassistant-ws", daemon=True).start()
+            print(f"Connected to Home Assistant WebSocket API at {self.url}")
+
+        # Subscribe before fetching states so no change falls between the two
+        try:
+            self._request({"type": "subscribe_events", "event_type": "state_changed"})
+            result = self._request({"type": "get_states"})
+        except HomeAssistantWebSocketError:
+            self._drop(ws)  # half set up; the connect loop starts over
+            raise
+        with self._states_lock:
+            for state in result.get("result") or []:
+                if state.get("entity_id") in self._entities:
+                    self._states[state["entity_id"]] = state
+
+    def _read_loop(self, ws) -> None:
+        try:
+            while True:
+                message = json.loads(ws.recv())
+                if message.get("type") == "event":
+                    self._handle_event(message.get("event") or {})
+                    continue
+                waiter = self._pending.pop(message.get("id"), None)
+                if waiter is not None:
+                    waiter[1] = message
+                    waiter[0].set()
+        except Exception as e:
+            print(f"Home Assistant WebSocket closed: {e}")
+        finally:
+            self._drop(ws)
+            self.start()
+
+    def _handle_event(self, event: dict) -> None:
+        data = event.get("data") or {}
+        entity_id = data.get("entity_id")
+        if entity_id not in self._entities:
+            return
+        with self._states_lock:
+            if data.get("new_state") is None:
+                self._states.pop(entity_id, None)
+            else:
+                self._states[entity_id] = data["new_state"]
+
+    def _drop(self, ws) -> None:
+        with self._connect_lock:
+            if self._ws is ws:
+                self._ws = None
+        try:
+            ws.close()
+        except Exception:
+            pass
+        # Anyone still waiting on this connection gets an empty result
+        for message_id in list(self._pending):
+            waiter = self._pending.pop(message_id, None)
+            if waiter is not None:
+                waiter[0].set()
+        with self._states_lock:
+            self._states.clear()  # no events while disconnected, so it would go stale
+
+    def _request(self, payload: dict, timeout: Optional[float] = None) -> dict:
+        timeout = RESULT_TIMEOUT if timeout is None else timeout
+        ws = self._ws
+        if ws is None:
+            raise WebSocketNotSent("not connected")
+        waiter = [threading.Event(), None]
+        with self._send_lock:
+            message_id = next(self._ids)
+            self._pending[message_id] = waiter
+            try:
+                ws.send(json.dumps(dict(payload, id=message_id)))
+            except Exception as e:
+                self._pending.pop(message_id, None)
+                self._drop(ws)
+                raise WebSocketNotSent(f"send failed: {e}") from e
+        if not waiter[0].wait(timeout):
+            self._pending.pop(message_id, None)
+            raise HomeAssistantWebSocketError(f"no reply to {payload['type']} within {timeout}s")
+        if waiter[1] is None:
+            raise HomeAssistantWebSocketError("connection closed")
+        return waiter[1]
+
+    def call_service(self, service: str, data: dict) -> bool:
+        """
+        Call "domain/service" with data; returns True if Home Assistant accepted it.
+        Raises WebSocketNotSent if the call never went out, and
+        HomeAssistantWebSocketError if it went out but got no reply.
+        """
+        if self._ws is None:
+            self.start()
+            raise WebSocketNotSent("not connected")
+        domain, service_name = service.split("/", 1)
+        result = self._request({
+            "type": "call_service",
+            "domain": domain,
+            "service": service_name,
+            "service_data": data,
+        })
+        if result.get("success"):
+            return True
+        print(f"Error calling service '{service}': {result.get('error')}")
+        return False
+
+    def state(self, entity_id: str) -> Optional[dict]:
+        """Last known state of a watched entity, or None if unknown or not connected yet."""
+        if self._ws is None:
+            self.start()
+            return None
+        with self._states_lock:
+            return self._states.get(entity_id)
+
+    def close(self) -> None:
+        self._closed = True
+        ws = self._ws
+        if ws is not None:
+            self._drop(ws)
@@ -1,25 +1,36 @@
 import os
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from functools import partial
 from typing import Optional
 
 import requests
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from twitchio.ext import commands
 
 import commandhandler
 import plaque_board_controller
+import probe_cache
 from app import app as flask_app
-from storage import find_plaque, load_commands, load_secrets, save_secrets
-from tts_module import gotts
-from youtube_utils import verify_youtube_keys
-
-CHAT_POLL_INTERVAL = 5  # seconds between YouTube chat polls
+from dedup import RecentIdWindow
+from pipeline import Action, ChatPipeline
+from poll_scheduler import PollScheduler, quota_tracker
+from youtube_stream import StreamUnavailable, stream_live_chat
+from storage import find_plaque, load_secrets, save_secrets
+from tts_module import gotts, say_chat
+from youtube_utils import (
+    PROBE_TIMEOUT,
+    YOUTUBE_API_ENDPOINT,
+    ApiKeyPool,
+    client_pool,
+    verify_youtube_keys,
+)
 
 
 def build_youtube_client(api_key: str):
-    return build("youtube", "v3", developerKey=api_key)
+    """Return the pooled service object for a key; it is only built once."""
+    return client_pool.client(api_key)
 
 
 def should_switch_api_key(error: HttpError, key_count: int) -> bool:
@@ -33,42 +44,77 @@ def should_switch_api_key(error: HttpError, key_count: int) -> bool:
     return b"quota" in content.lower()
 
 
-def handle_message(display_name: str, message_text: str, is_superchat: bool = False) -> None:
-    """Route incoming chat messages to commands, LEDs, and TTS."""
-    if not display_name or not message_text:
-        return
-
-    normalized_text = message_text.strip()
+def route_message(display_name: str, normalized_text: str, is_superchat: bool = False) -> list[Action]:
+    """Decide which LED, command, and TTS actions a chat message triggers."""
+    actions: list[Action] = []
     normalized_lower = normalized_text.lower()
 
-    if find_plaque(display_name):
-        threading.Thread(
-            target=plaque_board_controller.set_leds_for_user,
-            args=(display_name, 5),
-            daemon=True,
-        ).start()
+    # One index lookup gives both the LED plaque and the user's access tier
+    plaque = find_plaque(display_name)
+    user_access_level = commandhandler.access_level_for_plaque(plaque, is_superchat)
+
+    if plaque:
+        actions.append(
+            Action(
+                "leds",
+                plaque_board_controller.set_leds_for_user,
+                (display_name, 5),
+                key=display_name.casefold(),
+            )
+        )
 
     if normalized_lower.startswith("!dec"):
         dec_text = normalized_text[5:].strip()
         if dec_text:
             ttstext = f"{display_name} said: {dec_text}"
-            threading.Thread(target=gotts, args=(ttstext, False), daemon=True).start()
-        return
+            actions.append(
+                Action("tts", partial(gotts, user=display_name, tier=user_access_level), (ttstext, False))
+            )
+        return actions
+
+    match = commandhandler.match_command(normalized_lower)
+    if match:
+        # Access and rate limits are checked here so rejected commands never queue
+        if commandhandler.authorize_command(match, display_name, user_access_level):
+            print(f"Executing command {match.text} from {display_name}")
+            actions.append(
+                Action(
+                    "command",
+                    commandhandler.perform_command_action,
+                    (match, display_name),
+                )
+            )
+        return actions
+
+    actions.append(Action("tts", say_chat, (display_name, normalized_text, user_access_level)))
+    return actions
+
+
+chat_pipeline = ChatPipeline(route_message)
 
-    commands = load_commands()
-    for base_command in commands.keys():
-        if base_command in normalized_lower:
-            commandhandler.execute_command(normalized_lower, display_name, is_superchat)
-            return
 
-    ttstext = f"{display_name} said: {normalized_text}"
-    threading.Thread(target=gotts, args=(ttstext,), daemon=True).start()
+def handle_message(
+    display_name: str, message_text: str, is_superchat: bool = False, source: str = ""
+) -> None:
+    """Queue an incoming chat message; routing and actions run on the pipeline."""
+    chat_pipeline.submit(display_name, message_text, is_superchat, source)
 
 
 
+def parse_list_setting(value) -> list[str]:
+    """Accept either a list or a comma-separated string from secrets.json."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [item.strip() for item in value if item and item.strip()]
+
+
 class TwitchBot(commands.Bot):
-    def __init__(self, token, channel):
-        super().__init__(token=token, prefix="!", initial_channels=[channel])
+    def __init__(self, token, channels):
+        if isinstance(channels, str):
+            channels = [channels]
+        super().__init__(token=token, prefix="!", initial_channels=list(channels))
 
     async def event_ready(self):
         print(f"Logged in as {self.nick}")
@@ -76,7 +122,8 @@ class TwitchBot(commands.Bot):
     async def event_message(self, message):
         if message.author is None or message.author.name == self.nick:
             return
-        handle_message(message.author.name, message.content)
+        channel = message.channel.name if message.channel else ""
+        handle_message(message.author.name, message.content, source=f"twitch:{channel}")
 
 
 def refresh_twitch_oauth_token(secrets: dict) -> Optional[str]:
@@ -112,16 +159,50 @@ def refresh_twitch_oauth_token(secrets: dict) -> Optional[str]:
         print(f"Failed to refresh Twitch token: {resp.status_code} {resp.text}")
         return secrets.get("TWITCH_OAUTH_TOKEN")
 
-def listen_to_live_chat(live_chat_id: str, api_keys: list[str], skip_first_batch: bool = True) -> None:
-    """Continuously poll YouTube live chat and forward the messages."""
+STREAM_RETRY_LIMIT = 3  # consecutive stream failures before falling back to polling
+
+
+def forward_chat_items(items: list[dict], processed_message_ids: RecentIdWindow, source: str = "") -> None:
+    """Hand new YouTube chat items to handle_message, skipping ones already seen."""
+    for item in items:
+        if not processed_message_ids.add(item['id']):
+            continue
+
+        message_text = item['snippet']['displayMessage']
+        display_name = item['authorDetails']['displayName']
+        is_superchat = item['snippet'].get('superChatDetails') is not None
+        handle_message(display_name, message_text, is_superchat, source)
+
+
+def prime_chat_items(items: list[dict], processed_message_ids: RecentIdWindow) -> None:
+    """Prime the cache with existing messages to avoid replaying on restarts."""
+    for item in items:
+        processed_message_ids.add(item['id'])
+
+
+def listen_to_live_chat(
+    live_chat_id: str,
+    api_keys: list[str] | ApiKeyPool,
+    skip_first_batch: bool = True,
+    page_token: Optional[str] = None,
+    processed_message_ids: Optional[RecentIdWindow] = None,
+    pollers: int = 1,
+) -> None:
+    """
+    Continuously poll YouTube live chat and forward the messages.
+    pollers is how many chats share the key pool's quota at the same time.
+    """
     if not api_keys:
         print("No YouTube API keys configured; cannot listen to chat.")
         return
 
-    current_key_index = 0
-    youtube = build_youtube_client(api_keys[current_key_index])
-    processed_message_ids = set()
-    next_page_token = None
+    key_pool = api_keys if isinstance(api_keys, ApiKeyPool) else ApiKeyPool(api_keys)
+    scheduler = PollScheduler(pollers=pollers)
+    source = f"youtube:{live_chat_id}"
+    if processed_message_ids is None:
+        # Bounded: nextPageToken already skips old pages, so only recent IDs matter
+        processed_message_ids = RecentIdWindow()
+    next_page_token = page_token
 
     first_batch = True
 
@@ -133,12 +214,13 @@ def listen_to_live_chat(live_chat_id: str, api_keys: list[str], skip_first_batch
             }
             if next_page_token:
                 request_params["pageToken"] = next_page_token
-            request = youtube.liveChatMessages().list(**request_params)
+            api_key = key_pool.current_key
+            request = key_pool.client(api_key).liveChatMessages().list(**request_params)
+            quota_tracker.record(api_key, "liveChatMessages.list")
             response = request.execute()
         except HttpError as e:
-            if should_switch_api_key(e, len(api_keys)):
-                current_key_index = (current_key_index + 1) % len(api_keys)
-                youtube = build_youtube_client(api_keys[current_key_index])
+            if should_switch_api_key(e, len(key_pool)):
+                current_key_index = key_pool.rotate(api_key)
                 print(
                     f"Switched to backup YouTube API key (index {current_key_index}) "
                     f"after error: {e}"
@@ -152,29 +234,97 @@ def listen_to_live_chat(live_chat_id: str, api_keys: list[str], skip_first_batch
         items = response.get('items', [])
 
         if first_batch and skip_first_batch:
-            # Prime the cache with existing messages to avoid replaying on restarts
-            for item in items:
-                processed_message_ids.add(item['id'])
-            first_batch = False
+            prime_chat_items(items, processed_message_ids)
         else:
-            first_batch = False
-            for item in items:
-                message_id = item['id']
-                if message_id in processed_message_ids:
-                    continue
-
-                processed_message_ids.add(message_id)
-                message_text = item['snippet']['displayMessage']
-                display_name = item['authorDetails']['displayName']
-                is_superchat = item['snippet'].get('superChatDetails') is not None
-                handle_message(display_name, message_text, is_superchat)
+            forward_chat_items(items, processed_message_ids, source)
+        first_batch = False
 
         next_page_token = response.get("nextPageToken")
         if not next_page_token:
             print("No more live chat messages available.")
             break
 
-        time.sleep(CHAT_POLL_INTERVAL)
+        time.sleep(
+            scheduler.next_delay(response.get("pollingIntervalMillis"), len(items), key_pool.api_keys)
+        )
+
+    print(f"YouTube chat deduplication window: {processed_message_ids.stats()}")
+
+
+def listen_to_live_chat_stream(
+    live_chat_id: str,
+    api_keys: list[str] | ApiKeyPool,
+    skip_first_batch: bool = True,
+    pollers: int = 1,
+) -> None:
+    """
+    Follow YouTube live chat over one long-lived streamList connection.
+    Falls back to the polling loop, resuming from the last page token, when
+    the endpoint is unavailable or the stream keeps failing.
+    """
+    if not api_keys:
+        print("No YouTube API keys configured; cannot listen to chat.")
+        return
+
+    key_pool = api_keys if isinstance(api_keys, ApiKeyPool) else ApiKeyPool(api_keys)
+    source = f"youtube:{live_chat_id}"
+    processed_message_ids = RecentIdWindow()
+    state = {"prime": skip_first_batch, "offline": False, "received": 0}
+    page_token = None
+    keys_tried = 1
+    failures = 0
+
+    def on_response(response: dict) -> None:
+        items = response.get('items', [])
+        if state["prime"]:
+            prime_chat_items(items, processed_message_ids)
+            state["prime"] = False
+        else:
+            forward_chat_items(items, processed_message_ids, source)
+        state["received"] += 1
+        if response.get("offlineAt"):
+            state["offline"] = True
+
+    while failures < STREAM_RETRY_LIMIT:
+        state["received"] = 0
+        try:
+            page_token = stream_live_chat(
+                live_chat_id,
+                key_pool.current_key,
+                on_response,
+                page_token=page_token,
+                endpoint=YOUTUBE_API_ENDPOINT,
+            )
+        except StreamUnavailable as e:
+            if "quota" in str(e).lower() and keys_tried < len(key_pool):
+                current_key_index = key_pool.rotate()
+                keys_tried += 1
+                print(f"Switched to backup YouTube API key (index {current_key_index}) after error: {e}")
+                continue
+            print(f"YouTube chat stream unavailable ({e}); falling back to polling.")
+            break
+        except requests.exceptions.RequestException as e:
+            failures += 1
+            print(f"YouTube chat stream dropped ({e}); reconnecting ({failures}/{STREAM_RETRY_LIMIT}).")
+            time.sleep(min(2 ** failures, 30))
+            continue
+
+        if state["offline"]:
+            print("YouTube live chat went offline.")
+            print(f"YouTube chat deduplication window: {processed_message_ids.stats()}")
+            return
+        # The server closed the stream normally; reconnect from the last token.
+        # A stream that closes without sending anything counts as a failure.
+        failures = 0 if state["received"] else failures + 1
+
+    listen_to_live_chat(
+        live_chat_id,
+        key_pool,
+        skip_first_batch=state["prime"],
+        page_token=page_token,
+        processed_message_ids=processed_message_ids,
+        pollers=pollers,
+    )
 
 def _search_video_by_event(
     channel_id: str, api_keys: list[str], event_type: str
@@ -184,6 +334,7 @@ def _search_video_by_event(
     for api_key in api_keys:
         try:
             youtube = build_youtube_client(api_key)
+            quota_tracker.record(api_key, "search.list")
             request = youtube.search().list(
                 part="id",
                 channelId=channel_id,
@@ -220,6 +371,42 @@ def get_live_video_id(channel_id: str, api_keys: list[str]) -> Optional[str]:
     print("No active stream found; looking for upcoming scheduled streams.")
     return _search_video_by_event(channel_id, api_keys, "upcoming")
 
+def find_live_video_id(channel_id: str, api_keys: list[str], timeout: float = PROBE_TIMEOUT) -> Optional[str]:
+    """
+    Like get_live_video_id, but runs the live and upcoming searches at the
+    same time and caches a found video on disk for a couple of minutes.
+    """
+    if not api_keys:
+        print("No API keys available for fetching live video ID.")
+        return None
+
+    def search_both() -> Optional[str]:
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="video-search")
+        live = executor.submit(_search_video_by_event, channel_id, api_keys, "live")
+        upcoming = executor.submit(_search_video_by_event, channel_id, api_keys, "upcoming")
+        deadline = time.monotonic() + timeout
+        try:
+            video_id = live.result(timeout=timeout)
+            if video_id:
+                return video_id
+            print("No active stream found; looking for upcoming scheduled streams.")
+            return upcoming.result(timeout=max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            print("Timed out searching for a live or upcoming broadcast.")
+            return None
+        finally:
+            executor.shutdown(wait=False)
+
+    return probe_cache.cached("live_video", (channel_id,), search_both)
+
+
+def get_live_chat_id_cached(video_id: str, api_keys: list[str]) -> Optional[str]:
+    """get_live_chat_id backed by the probe cache on disk."""
+    return probe_cache.cached(
+        "live_chat_id", (video_id,), lambda: get_live_chat_id(video_id, api_keys)
+    )
+
+
 def get_live_chat_id(video_id: str, api_keys: list[str]) -> Optional[str]:
     """
     Fetch the live chat ID for the given video.
@@ -233,6 +420,7 @@ def get_live_chat_id(video_id: str, api_keys: list[str]) -> Optional[str]:
     for api_key in api_keys:
         try:
             youtube = build_youtube_client(api_key)
+            quota_tracker.record(api_key, "videos.list")
             request = youtube.videos().list(part="liveStreamingDetails", id=video_id)
             response = request.execute()
 
@@ -278,58 +466,101 @@ def input_with_timeout(prompt: str, timeout: int = 10) -> Optional[str]:
 if __name__ == '__main__':
     if not os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
         secrets = load_secrets()
-        
-        refreshed_token = refresh_twitch_oauth_token(secrets)
+        if secrets.get("stream_hours"):
+            # Spread the YouTube quota over the expected stream length
+            quota_tracker.horizon = float(secrets["stream_hours"]) * 3600
+        configured_keys = [
+            key for key in (secrets.get("api_key"), secrets.get("api_key_backup")) if key and key.strip()
+        ]
+
+        # The startup probes are independent network calls, so run them together;
+        # the YouTube ones are cached on disk so quick restarts skip them.
+        probe_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup-probe")
+        token_probe = probe_executor.submit(refresh_twitch_oauth_token, secrets)
+        keys_probe = probe_executor.submit(verify_youtube_keys, secrets)
+        video_probe = None
+        if configured_keys and secrets.get("channel_id"):
+            video_probe = probe_executor.submit(
+                find_live_video_id, secrets["channel_id"], configured_keys
+            )
+
+        try:
+            refreshed_token = token_probe.result(timeout=PROBE_TIMEOUT)
+        except TimeoutError:
+            print("Timed out refreshing the Twitch token; using the stored one.")
+            refreshed_token = secrets.get("TWITCH_OAUTH_TOKEN")
         secrets["TWITCH_OAUTH_TOKEN"] = refreshed_token
 
-        api_key_status = verify_youtube_keys(secrets)
-        invalid_keys = [name for name, ok in api_key_status.items() if not ok]
+        api_key_status = keys_probe.result()  # bounded by verify_youtube_keys' own timeout
+        # The backup key is optional; leaving it blank must not disable YouTube
+        invalid_keys = [
+            name
+            for name, status in api_key_status.items()
+            if not status.get("ok") and (name == "api_key" or (secrets.get(name) or "").strip())
+        ]
         api_keys: list[str] = []
         if invalid_keys:
             print(
-                "Cannot start YouTube integration until both API keys verify. "
+                "Cannot start YouTube integration until the configured API keys verify. "
                 f"Invalid keys: {', '.join(invalid_keys)}"
             )
         else:
-            api_keys = [
-                secrets["api_key"],
-                secrets["api_key_backup"],
-            ]
+            api_keys = configured_keys
 
         # Try to get an active live video ID automatically
         video_id = None
-        if api_keys:
-            video_id = get_live_video_id(secrets['channel_id'], api_keys)
-        else:
+        if api_keys and video_probe is not None:
+            try:
+                video_id = video_probe.result(timeout=PROBE_TIMEOUT)
+            except TimeoutError:
+                print("Timed out looking for a live video.")
+        elif not api_keys:
             print("Skipping YouTube chat setup until API keys verify successfully.")
+        probe_executor.shutdown(wait=False)
 
-        if api_keys and not video_id:
+        # Simulcasts / co-streams: extra broadcasts to follow alongside the main one
+        extra_video_ids = parse_list_setting(secrets.get("extra_video_ids"))
+
+        if api_keys and not video_id and not extra_video_ids:
             print("No active live stream found.")
             video_id = input_with_timeout("Please enter a video ID manually: ", timeout=10)
 
+        video_ids = list(dict.fromkeys(v for v in [video_id, *extra_video_ids] if v))
         if not api_keys:
             print("No valid YouTube API keys available; skipping YouTube chat.")
-        elif not video_id:
+        elif not video_ids:
             print("No valid video ID provided; skipping YouTube chat.")
         else:
-            live_chat_id = get_live_chat_id(video_id, api_keys)
-
-            if live_chat_id:
-                print(f"Found live chat for video {video_id}. Listening for messages...")
+            live_chat_ids = {}
+            for candidate in video_ids:
+                live_chat_id = get_live_chat_id_cached(candidate, api_keys)
+                if live_chat_id:
+                    live_chat_ids[candidate] = live_chat_id
+                else:
+                    print(f"Live chat not found for video {candidate}. Skipping it.")
+
+            # Every chat shares one key pool, the quota tracker and the pipeline
+            key_pool = ApiKeyPool(api_keys)
+            # "youtube_ingest": "stream" opts into streamList with polling fallback
+            use_stream = secrets.get("youtube_ingest") == "stream"
+            for candidate, live_chat_id in live_chat_ids.items():
+                print(f"Found live chat for video {candidate}. Listening for messages...")
                 threading.Thread(
-                    target=listen_to_live_chat,
-                    args=(live_chat_id, api_keys, True),
+                    target=listen_to_live_chat_stream if use_stream else listen_to_live_chat,
+                    args=(live_chat_id, key_pool, True),
+                    kwargs={"pollers": len(live_chat_ids)},
                     daemon=True,
                 ).start()
-            else:
+            if not live_chat_ids:
                 print("Live chat not found for this video. Disable Youtube Chat.")
 
-        # Start Twitch bot
-        if refreshed_token:
-            twitch_bot = TwitchBot(refreshed_token, secrets["TWITCH_CHANNEL"])
+        # Start Twitch bot (TWITCH_CHANNEL may list several channels, comma separated)
+        twitch_channels = parse_list_setting(secrets.get("TWITCH_CHANNEL"))
+        if refreshed_token and twitch_channels:
+            twitch_bot = TwitchBot(refreshed_token, twitch_channels)
             threading.Thread(target=twitch_bot.run, daemon=True).start()
         else:
-            print("No Twitch token available; skipping Twitch bot startup.")
+            print("No Twitch token or channel available; skipping Twitch bot startup.")
     # Run the Flask app
     # flask_app = Flask(__name__)
     # flask_app.secret_key = 'supersecretkey'
@@ -0,0 +1,183 @@
+"""
+Local mock of the YouTube Data API endpoints the bot uses.
+
+Serves liveChatMessages.list and the server-streaming streamList endpoint
+(synthetic chat at --rate messages/sec, or the responses recorded in a
+--replay JSON file), videos.list and search.list. --stream-status makes
+streamList fail with that HTTP status so the polling fallback can be tried. Start it and run main.py
+with YOUTUBE_API_ENDPOINT set to the printed URL.
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MOCK_VIDEO_ID = "mockvideo01"
+MOCK_CHAT_ID = "mock-live-chat"
+
+
+class MockYouTube(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, rate=1.0, polling_interval_ms=2000, replay=None,
+                 stream_interval=0.5, stream_seconds=60.0, stream_status=None):
+        super().__init__(address, _Handler)
+        self.rate = rate
+        self.polling_interval_ms = polling_interval_ms
+        self.replay = list(replay or [])
+        self.stream_interval = stream_interval
+        self.stream_seconds = stream_seconds
+        self.stream_status = stream_status  # e.g. 404 to reject every streamList call
+        self.page_tokens = []  # (path, pageToken) of every chat request, in order
+        self.requests = Counter()
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def chat_page(self, page_token):
+        """Return one liveChatMessages.list response after page_token."""
+        with self.lock:
+            if self.replay:
+                position = int(page_token or 0)
+                if position >= len(self.replay):
+                    # Replay finished: keep the chat open but quiet
+                    response = {"items": [], "pollingIntervalMillis": self.polling_interval_ms}
+                else:
+                    response = dict(self.replay[position])
+                response["nextPageToken"] = str(min(position + 1, len(self.replay)))
+                return response
+
+            now = time.monotonic()
+            sent = int(page_token or 0)
+            available = int((now - self.started) * self.rate)
+            items = [_chat_item(sequence) for sequence in range(sent, available)]
+            return {
+                "kind": "youtube#liveChatMessageListResponse",
+                "pollingIntervalMillis": self.polling_interval_ms,
+                "nextPageToken": str(max(sent, available)),
+                "items": items,
+            }
+
+    def stream_pages(self, page_token):
+        """Yield streamList responses until the replay ends or stream_seconds pass."""
+        if self.replay:
+            for position in range(int(page_token or 0), len(self.replay)):
+                response = dict(self.replay[position])
+                response["nextPageToken"] = str(position + 1)
+                yield response
+                time.sleep(self.stream_interval)
+            return
+
+        deadline = time.monotonic() + self.stream_seconds
+        while time.monotonic() < deadline:
+            response = self.chat_page(page_token)
+            page_token = response["nextPageToken"]
+            if response["items"]:
+                yield response
+            time.sleep(self.stream_interval)
+
+
+def _chat_item(sequence):
+    return {
+        "id": f"mock-message-{sequence}",
+        "snippet": {"displayMessage": f"mock message {sequence}"},
+        "authorDetails": {"displayName": f"mock_viewer{sequence % 25}"},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockYouTube
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path.rstrip("/")
+        with self.server.lock:
+            self.server.requests[path.rsplit("/v3", 1)[-1]] += 1
+            if "/liveChat/messages" in path:
+                self.server.page_tokens.append((path.rsplit("/v3", 1)[-1], query.get("pageToken")))
+
+        if path.endswith("/liveChat/messages/stream") and self.server.stream_status:
+            status = self.server.stream_status
+            self._send_json(status, {"error": {"code": status, "message": "streamList disabled"}})
+        elif path.endswith("/liveChat/messages/stream"):
+            self._stream_chat(query.get("pageToken"))
+        elif path.endswith("/liveChat/messages"):
+            self._send_json(200, self.server.chat_page(query.get("pageToken")))
+        elif path.endswith("/videos"):
+            self._send_json(200, {"items": [{
+                "id": query.get("id", MOCK_VIDEO_ID),
+                "liveStreamingDetails": {"activeLiveChatId": MOCK_CHAT_ID},
+            }]})
+        elif path.endswith("/search"):
+            self._send_json(200, {"items": [{"id": {"videoId": MOCK_VIDEO_ID}}]})
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+    def _stream_chat(self, page_token):
+        # HTTP/1.0 without Content-Length: the body ends when the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        try:
+            separator = b"["
+            for response in self.server.stream_pages(page_token):
+                self.wfile.write(separator + json.dumps(response).encode("utf-8"))
+                self.wfile.flush()
+                separator = b",\r\n"
+            self.wfile.write(b"[]" if separator == b"[" else b"]")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(host="127.0.0.1", port=0, **kwargs):
+    """Start the mock on a background thread and return it."""
+    server = MockYouTube((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8124)
+    parser.add_argument("--rate", type=float, default=1.0, help="synthetic messages per second")
+    parser.add_argument("--polling-interval-ms", type=int, default=2000)
+    parser.add_argument("--replay", default=None, help="JSON list of recorded list responses")
+    parser.add_argument("--stream-seconds", type=float, default=60.0, help="length of each synthetic stream")
+    parser.add_argument("--stream-status", type=int, default=None, help="fail streamList with this HTTP status")
+    args = parser.parse_args()
+
+    replay = None
+    if args.replay:
+        with open(args.replay, "r", encoding="utf-8") as source:
+            replay = json.load(source)
+
+    server = MockYouTube(
+        (args.host, args.port),
+        rate=args.rate,
+        polling_interval_ms=args.polling_interval_ms,
+        replay=replay,
+        stream_seconds=args.stream_seconds,
+        stream_status=args.stream_status,
+    )
+    print(f"Mock YouTube API listening on {server.url} (video id {MOCK_VIDEO_ID})")
+    server.serve_forever()
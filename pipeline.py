@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Hashable, List, NamedTuple, Optional
+
+from dedup import CrossSourceWindow
+
+
+class ChatMessage(NamedTuple):
+    display_name: str
+    text: str
+    is_superchat: bool = False
+    source: str = ""  # e.g. "youtube:<live chat id>" or "twitch:<channel>"
+
+    @property
+    def sheddable(self) -> bool:
+        """Plain chat may be dropped under load; superchats and commands may not."""
+        return not self.is_superchat and not self.text.startswith(COMMAND_PREFIX)
+
+
+class Action(NamedTuple):
+    """A unit of work produced by the router for one of the action stages."""
+
+    kind: str
+    func: Callable[..., object]
+    args: tuple = ()
+    # Actions of the same kind sharing a key coalesce while one is still queued
+    key: Optional[Hashable] = None
+
+
+class StageConfig(NamedTuple):
+    maxsize: int
+    policy: str  # "drop_oldest", "drop_newest" or "coalesce"
+    workers: int = 1
+
+
+INGEST_QUEUE_SIZE = 256
+COMMAND_PREFIX = "!"
+
+DEFAULT_STAGES: Dict[str, StageConfig] = {
+    # LED highlights for the same user collapse into the one already waiting
+    "leds": StageConfig(maxsize=64, policy="coalesce", workers=2),
+    # Commands are rate limited anyway; shed new ones when the stage is full
+    "command": StageConfig(maxsize=32, policy="drop_newest", workers=2),
+    # Stale chat is the least useful thing to read out, so drop it first
+    "tts": StageConfig(maxsize=128, policy="drop_oldest", workers=1),
+}
+
+Router = Callable[[str, str, bool], List[Action]]
+
+
+class ChatPipeline:
+    """
+    Staged chat pipeline: normalise -> route -> dispatch to action workers.
+    The stages are bounded asyncio queues on a private event loop thread, so
+    chat sources only pay for a call_soon_threadsafe and blocking actions run
+    on a fixed-size executor instead of a thread per message.
+    """
+
+    def __init__(
+        self,
+        router: Router,
+        ingest_size: int = INGEST_QUEUE_SIZE,
+        stages: Optional[Dict[str, StageConfig]] = None,
+    ):
+        self._router = router
+        self._ingest_size = ingest_size
+        self._stages = dict(stages or DEFAULT_STAGES)
+        self._executor = ThreadPoolExecutor(
+            max_workers=sum(stage.workers for stage in self._stages.values()),
+            thread_name_prefix="chat-action",
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # Plain deque rather than asyncio.Queue so shedding can skip over
+        # superchats and commands; only touched from the loop thread
+        self._ingest: Deque[ChatMessage] = deque()
+        self._ingest_ready: Optional[asyncio.Event] = None
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._pending_keys: Dict[str, set] = {kind: set() for kind in self._stages}
+        # Simulcasts fan several chats into one pipeline; drop cross-posted copies
+        self._cross_posts = CrossSourceWindow()
+        self.counters: Counter = Counter()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(ready,), name="chat-pipeline", daemon=True
+            )
+            self._thread.start()
+            ready.wait()
+
+    def _run(self, ready: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._ingest_ready = asyncio.Event()
+        for kind, stage in self._stages.items():
+            self._queues[kind] = asyncio.Queue(maxsize=stage.maxsize)
+            for _ in range(stage.workers):
+                loop.create_task(self._action_worker(kind))
+        loop.create_task(self._route_worker())
+        ready.set()
+        loop.run_forever()
+
+    def submit(self, display_name: str, text: str, is_superchat: bool = False, source: str = "") -> None:
+        """Hand a chat message to the pipeline. Safe to call from any thread."""
+        self.start()
+        message = ChatMessage(display_name, text, is_superchat, source)
+        self._loop.call_soon_threadsafe(self._enqueue_message, message)
+
+    def _enqueue_message(self, message: ChatMessage) -> None:
+        self.counters["received"] += 1
+        text = message.text.strip() if message.text else ""
+        if not message.display_name or not text:
+            self.counters["ignored"] += 1
+            return
+        if self._cross_posts.is_cross_post(message.display_name, text, message.source, time.monotonic()):
+            self.counters["cross_posts"] += 1
+            return
+        message = message._replace(text=text)
+        if len(self._ingest) >= self._ingest_size and not self._shed_plain_chat():
+            # Nothing but superchats and commands waiting: refuse the newcomer
+            self.counters["dropped_ingest" if message.sheddable else "dropped_ingest_priority"] += 1
+            return
+        self._ingest.append(message)
+        self._ingest_ready.set()
+
+    def _shed_plain_chat(self) -> bool:
+        """Drop the oldest plain chat message waiting for the router, if any."""
+        for index, waiting in enumerate(self._ingest):
+            if waiting.sheddable:
+                del self._ingest[index]
+                self.counters["dropped_ingest"] += 1
+                return True
+        return False
+
+    async def _route_worker(self) -> None:
+        while True:
+            if not self._ingest:
+                self._ingest_ready.clear()
+                await self._ingest_ready.wait()
+                continue
+            message = self._ingest.popleft()
+            try:
+                actions = self._router(message.display_name, message.text, message.is_superchat)
+            except Exception as e:
+                self.counters["route_errors"] += 1
+                print(f"Error routing message from {message.display_name}: {e}")
+                continue
+            self.counters["routed"] += 1
+            for action in actions:
+                self._dispatch(action)
+
+    def _dispatch(self, action: Action) -> None:
+        kind = action.kind
+        queue = self._queues[kind]
+        pending = self._pending_keys[kind]
+        policy = self._stages[kind].policy
+
+        if action.key is not None and action.key in pending and policy == "coalesce":
+            self.counters[f"coalesced_{kind}"] += 1
+            return
+        if queue.full():
+            if policy == "drop_oldest":
+                dropped = queue.get_nowait()
+                pending.discard(dropped.key)
+            else:
+                self.counters[f"dropped_{kind}"] += 1
+                return
+            self.counters[f"dropped_{kind}"] += 1
+        if action.key is not None:
+            pending.add(action.key)
+        queue.put_nowait(action)
+
+    async def _action_worker(self, kind: str) -> None:
+        queue = self._queues[kind]
+        pending = self._pending_keys[kind]
+        loop = asyncio.get_running_loop()
+        while True:
+            action = await queue.get()
+            pending.discard(action.key)
+            try:
+                await loop.run_in_executor(self._executor, action.func, *action.args)
+                self.counters[f"executed_{kind}"] += 1
+            except Exception as e:
+                self.counters[f"failed_{kind}"] += 1
+                print(f"Error running {kind} action: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters plus the current depth of every stage queue."""
+        stats = dict(self.counters)
+        if self._ingest_ready is not None:
+            stats["depth_ingest"] = len(self._ingest)
+        for kind, queue in self._queues.items():
+            stats[f"depth_{kind}"] = queue.qsize()
+        return stats
@@ -1,17 +1,42 @@
-import requests
+import json
+import threading
 import time
+from array import array
+from typing import NamedTuple
+
+import requests
+from requests.adapters import HTTPAdapter
 
-from storage import find_plaque, load_secrets
+from storage import cached_secrets, find_plaque
+
+TICK_SECONDS = 0.05  # frames are merged and sent at most once per tick
+WHEEL_SLOTS = 512  # ~25 s horizon at 50 ms ticks; longer expiries wrap around
+OFF_COLOUR = "000000"
+MAX_LED_INDEX = 0xFFFF  # indices are stored as array('H')
+FRAME_RETRY_MAX = 2.0  # longest wait, in seconds, before resending a failed frame
+
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
 
 
 def send_request_with_retry(api_endpoint, payload, max_retries=3, delay=1):
     for attempt in range(max_retries):
         try:
-            response = requests.post(api_endpoint, json=payload)
+            if isinstance(payload, bytes):
+                # Pre-encoded body from a compiled plaque
+                response = _session.post(
+                    api_endpoint,
+                    data=payload,
+                    headers={"Content-Type": "application/json"},
+                    timeout=5,
+                )
+            else:
+                response = _session.post(api_endpoint, json=payload, timeout=5)
             response.raise_for_status()
             return response
         except requests.exceptions.RequestException as e:
-            if 'response' in locals() and response is not None and response.status_code == 503:
+            if e.response is not None and e.response.status_code == 503:
                 print(f"503 error, retrying... ({attempt + 1}/{max_retries})")
                 time.sleep(delay)
             else:
@@ -21,29 +46,276 @@ def send_request_with_retry(api_endpoint, payload, max_retries=3, delay=1):
     return None
 
 
+def send_frame(api_endpoint, payload):
+    """One attempt only; the compositor resends failed frames on its own schedule."""
+    return send_request_with_retry(api_endpoint, payload, max_retries=1)
+
+
+def _board_endpoint():
+    return f"{cached_secrets()['board_ip']}/json/state"
+
+
+def encode_segments(pixels):
+    """
+    Run-length encode {index: hex_colour} into a WLED "i" list.
+    Consecutive indices with the same colour become [start, stop, colour].
+    """
+    segments = []
+    run_start = run_end = run_colour = None
+    for index in sorted(pixels):
+        colour = pixels[index]
+        if run_colour == colour and index == run_end + 1:
+            run_end = index
+            continue
+        if run_colour is not None:
+            segments.extend(_segment(run_start, run_end, run_colour))
+        run_start = run_end = index
+        run_colour = colour
+    if run_colour is not None:
+        segments.extend(_segment(run_start, run_end, run_colour))
+    return segments
+
+
+def _segment(start, end, colour):
+    if start == end:
+        return [start, colour]
+    return [start, end + 1, colour]
+
+
+class CompiledPlaque(NamedTuple):
+    indices: array  # array('H') of LED indices
+    rgb: int  # packed 0xRRGGBB
+    hex_colour: str
+    segments: list  # WLED "i" list lighting just this plaque
+    payload: bytes  # ready-to-send request body for segments
+
+
+def parse_colour(leds_colour):
+    """Return the packed RGB int for a '#RRGGBB' or '#RGB' colour string."""
+    digits = leds_colour.strip().lstrip('#')
+    if len(digits) == 3:
+        digits = "".join(digit * 2 for digit in digits)
+    if len(digits) != 6:
+        raise ValueError(f"colour must look like #RRGGBB or #RGB, got {leds_colour!r}")
+    return int(digits, 16)
+
+
+def compile_plaque(leds, leds_colour='#FFFFFF'):
+    """Parse a plaque's Leds/Leds_colour strings once into send-ready form."""
+    indices = sorted({int(index) for index in leds.split(",") if index.strip()})
+    if indices and not (0 <= indices[0] and indices[-1] <= MAX_LED_INDEX):
+        raise ValueError(f"LED indices must be between 0 and {MAX_LED_INDEX}: {leds!r}")
+    indices = array('H', indices)
+    rgb = parse_colour(leds_colour or '#FFFFFF')
+    hex_colour = f"{rgb:06x}"
+    segments = encode_segments(dict.fromkeys(indices, hex_colour))
+    payload = json.dumps({"seg": {"id": 0, "i": segments}}, separators=(",", ":")).encode("utf-8")
+    return CompiledPlaque(indices, rgb, hex_colour, segments, payload)
+
+
+# plaque_key -> ((Leds, Leds_colour), CompiledPlaque)
+_compiled_plaques = {}
+_compiled_lock = threading.Lock()
+
+
+def plaque_key(plaque):
+    """Case-folded name identifying a plaque; Twitch-only plaques have no YT_Name."""
+    return (plaque.get('YT_Name') or plaque.get('twitchusername') or '').casefold()
+
+
+def compiled_plaque(plaque):
+    """Return the compiled form of a plaque record, compiling it on first use."""
+    key = plaque_key(plaque)
+    source = (plaque.get('Leds', ''), plaque.get('Leds_colour', '#FFFFFF'))
+    with _compiled_lock:
+        cached = _compiled_plaques.get(key)
+        if cached is not None and cached[0] == source:
+            return cached[1]
+    compiled = compile_plaque(*source)
+    with _compiled_lock:
+        _compiled_plaques[key] = (source, compiled)
+    return compiled
+
+
+def invalidate_plaque(name):
+    """Forget the compiled form of one plaque (by YT_Name, or twitchusername if it has none)."""
+    with _compiled_lock:
+        _compiled_plaques.pop(name.casefold(), None)
+
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) scheduling, expiry cost proportional to due entries."""
+
+    def __init__(self, slots=WHEEL_SLOTS):
+        self._slots = [[] for _ in range(slots)]
+        self._current = 0
+
+    def schedule(self, due_tick, item):
+        due_tick = max(due_tick, self._current + 1)
+        self._slots[due_tick % len(self._slots)].append((due_tick, item))
+
+    def advance(self, to_tick):
+        """Move the wheel to to_tick and return every item that became due."""
+        due = []
+        steps = min(to_tick - self._current, len(self._slots))
+        for offset in range(1, steps + 1):
+            slot_index = (self._current + offset) % len(self._slots)
+            slot = self._slots[slot_index]
+            if not slot:
+                continue
+            keep = []
+            for entry in slot:
+                (due if entry[0] <= to_tick else keep).append(entry)
+            self._slots[slot_index] = keep
+        self._current = max(self._current, to_tick)
+        return [item for _, item in due]
+
+
+class LedCompositor:
+    """
+    Keeps the plaque board state in memory and merges concurrent highlights
+    into one frame per tick. Only pixels that changed since the last frame are
+    sent, and the board is unfrozen once when the last highlight expires.
+    """
+
+    def __init__(self, send=send_frame, tick=TICK_SECONDS):
+        self._send = send
+        self._tick = tick
+        self._epoch = time.monotonic()
+        self._cond = threading.Condition()
+        self._wheel = TimerWheel()
+        self._highlights = {}  # key -> (indices, colour, expires_tick, payload)
+        self._last_key = None
+        self._sent = {}  # index -> colour currently shown on the board
+        self._dirty = False
+        self._thread = None
+        self._failures = 0
+        self.frames_sent = 0
+        self.frames_failed = 0
+        self.highlights_merged = 0
+
+    def _now_tick(self):
+        return int((time.monotonic() - self._epoch) / self._tick)
+
+    def highlight(self, key, indices, colour, duration, payload=None):
+        """
+        Light indices in colour for duration seconds; re-triggering a key extends it.
+        payload, when given, is a pre-encoded body lighting exactly those indices.
+        """
+        with self._cond:
+            expires = self._now_tick() + max(1, int(duration / self._tick))
+            if key in self._highlights:
+                self.highlights_merged += 1
+            self._highlights[key] = (indices, colour, expires, payload)
+            self._last_key = key
+            self._wheel.schedule(expires, (key, expires))
+            self._dirty = True
+            self._ensure_thread()
+            self._cond.notify()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="led-compositor", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._highlights:
+                    self._cond.wait()  # idle: no wake-ups until a highlight arrives
+                if not self._dirty:
+                    self._cond.wait(self._tick)
+                for key, expires in self._wheel.advance(self._now_tick()):
+                    entry = self._highlights.get(key)
+                    if entry is not None and entry[2] == expires:
+                        del self._highlights[key]
+                        self._dirty = True
+                if not self._dirty:
+                    continue
+                self._dirty = False
+                payload, frame = self._compose()
+            wait = self._tick  # merge whatever arrives during the next tick
+            if payload is not None:
+                try:
+                    sent = self._send(_board_endpoint(), payload) is not None
+                except Exception as e:
+                    print(f"Error sending LED frame: {e}")
+                    sent = False
+                with self._cond:
+                    if sent:
+                        self._sent = frame
+                        self._failures = 0
+                        self.frames_sent += 1
+                    else:
+                        # _sent still describes the board, so the next frame
+                        # carries these changes again
+                        self._dirty = True
+                        self._failures += 1
+                        self.frames_failed += 1
+                        wait = min(FRAME_RETRY_MAX, self._tick * 2 ** self._failures)
+            time.sleep(wait)
+
+    def _compose(self):
+        """
+        Build the payload that moves the board from _sent to the current frame.
+        Returns (payload, frame); the caller commits frame to _sent once the
+        payload has been delivered.
+        """
+        frame = {}
+        for indices, colour, _, _ in self._highlights.values():
+            for index in indices:
+                frame[index] = colour
+        if not frame:
+            if not self._sent:
+                return None, frame
+            return {"seg": {"id": 0, "frz": False}}, frame
+
+        changes = {index: colour for index, colour in frame.items() if self._sent.get(index) != colour}
+        for index in self._sent:
+            if index not in frame:
+                changes[index] = OFF_COLOUR
+        if not changes:
+            return None, frame
+
+        # Common case: the only change is one plaque lighting up on its own,
+        # which its compiled payload already describes byte for byte.
+        last = self._highlights.get(self._last_key)
+        self._last_key = None
+        if last is not None and last[3] is not None and len(changes) == len(last[0]):
+            colour = last[1]
+            if all(changes.get(index) == colour for index in last[0]):
+                return last[3], frame
+        return {"seg": {"id": 0, "i": encode_segments(changes)}}, frame
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": len(self._highlights),
+                "lit_pixels": len(self._sent),
+                "frames_sent": self.frames_sent,
+                "frames_failed": self.frames_failed,
+                "highlights_merged": self.highlights_merged,
+            }
+
+
+compositor = LedCompositor()
+
 
 def set_leds(led_indices, color, timehere):
-    secrets = load_secrets()
-    led_indices_new = [int(index) for index in led_indices.split(",") if index.strip()]
-    api_endpoint = f"" + str(secrets['board_ip']) + "/json/state"
-    payload = {"seg": {"id": 0, "i": []}}
-
-    # Convert the color tuple (r, g, b) to a hex string without the '#' prefix.
-    hex_color = '{:02x}{:02x}{:02x}'.format(*color)
-    # Construct the payload to set the color of each LED.
-    for index in led_indices_new:
-        payload["seg"]["i"].extend([index, hex_color])
-
-    response = send_request_with_retry(api_endpoint, payload)
-    if response is None:
-        return False
+    """Schedule a highlight on the board; returns without waiting for it to expire."""
+    # Convert the color tuple (r, g, b) to a hex string.
+    hex_color = '#{:02x}{:02x}{:02x}'.format(*color)
+    compiled = compile_plaque(led_indices, hex_color)
+    compositor.highlight(led_indices, compiled.indices, compiled.hex_colour, timehere, compiled.payload)
+    return True
 
-    time.sleep(timehere)
 
-    # Turn off the LEDs
-    payload = {"seg": {"id": 0, "frz": False}}
-    response = send_request_with_retry(api_endpoint, payload)
-    return response is not None
+def trigger_plaque(plaque, duration=5):
+    """Light a plaque record using its compiled indices and colour."""
+    compiled = compiled_plaque(plaque)
+    key = plaque_key(plaque)
+    compositor.highlight(key, compiled.indices, compiled.hex_colour, duration, compiled.payload)
+    return True
 
 
 def set_leds_for_user(display_name, duration=5):
@@ -52,17 +324,7 @@ def set_leds_for_user(display_name, duration=5):
         matching_plaque = find_plaque(display_name)
 
         if matching_plaque:
-            # Get color and convert from hex
-            color = matching_plaque.get('Leds_colour', '#FFFFFF')
-            color = color.lstrip('#')
-            r, g, b = tuple(int(color[i:i+2], 16) for i in (0, 2, 4))
-
-            # Get LED indices
-            leds = matching_plaque.get('Leds', '')
-            #print(f"Triggering LEDs for {display_name} - Color: #{color}, Leds: {leds}")
-
-            # Trigger the LEDs
-            return set_leds(leds, (r, g, b), duration)
+            return trigger_plaque(matching_plaque, duration)
     except Exception as e:
         print(f"Error triggering LEDs for {display_name}: {e}")
         return False
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable
+
+try:
+    from zoneinfo import ZoneInfo
+
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")  # YouTube quota resets at Pacific midnight
+except Exception:  # tzdata missing (e.g. bare Windows installs)
+    QUOTA_TIMEZONE = None
+
+DAILY_QUOTA = 10_000  # default units per API key per day
+QUOTA_COSTS = {
+    "liveChatMessages.list": 5,
+    "liveChatMessages.streamList": 5,  # charged per connection
+    "search.list": 100,
+    "videos.list": 1,
+}
+
+# The remaining budget is planned to last this long (or until the daily reset,
+# whichever comes first) rather than being spent evenly over a whole day.
+# "stream_hours" in secrets.json overrides it.
+QUOTA_HORIZON = 4 * 3600
+# Seconds of quiet polling a scheduler may bank and later spend polling a busy
+# chat at the server's interval, faster than the average the budget allows.
+QUOTA_BURST = 15 * 60
+
+DEFAULT_POLL_INTERVAL = 5.0  # seconds, used when the server gives no hint
+MIN_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 30.0
+IDLE_BACKOFF = 1.5  # multiplier per consecutive empty poll
+RATE_SMOOTHING = 0.3  # weight of the newest sample in the message-rate average
+
+
+class QuotaTracker:
+    """Count API units spent per key for the current quota day."""
+
+    def __init__(self, daily_quota: int = DAILY_QUOTA, horizon: float = QUOTA_HORIZON):
+        self.daily_quota = daily_quota
+        self.horizon = horizon
+        self._day = None
+        self._used: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(QUOTA_TIMEZONE)
+
+    def _roll_day(self) -> None:
+        today = self._now().date()
+        if today != self._day:
+            self._day = today
+            self._used.clear()
+
+    def record(self, api_key: str, method: str) -> None:
+        with self._lock:
+            self._roll_day()
+            self._used[api_key] += QUOTA_COSTS.get(method, 1)
+
+    def used(self, api_key: str) -> int:
+        with self._lock:
+            self._roll_day()
+            return self._used[api_key]
+
+    def remaining(self, api_keys: Iterable[str]) -> int:
+        with self._lock:
+            self._roll_day()
+            return sum(max(0, self.daily_quota - self._used[key]) for key in set(api_keys))
+
+    def seconds_until_reset(self) -> float:
+        now = self._now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), now.tzinfo)
+        return max(1.0, (midnight - now).total_seconds())
+
+    def min_interval(self, api_keys: Iterable[str], method: str, pollers: int = 1) -> float:
+        """
+        Average interval that makes the remaining budget last self.horizon
+        (or until the daily reset), shared between `pollers` concurrent loops.
+        """
+        remaining = self.remaining(api_keys)
+        cost = QUOTA_COSTS.get(method, 1) * max(1, pollers)
+        if remaining < cost:
+            return self.seconds_until_reset()
+        horizon = min(self.horizon, self.seconds_until_reset())
+        return horizon * cost / remaining
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._roll_day()
+            # Only show a key's tail so the secrets never end up in a log line
+            return {f"...{key[-4:]}": used for key, used in self._used.items()}
+
+
+quota_tracker = QuotaTracker()
+
+
+class PollScheduler:
+    """
+    Decide how long to wait before the next liveChatMessages.list call.
+    The server's pollingIntervalMillis is a floor; busy chats are polled at
+    that floor and idle ones back off exponentially. The quota sets the
+    average interval rather than every interval: time an idle chat spends
+    polling slower than that average is banked (up to QUOTA_BURST) and spent
+    when it gets busy again, so a burst is polled at the server's pace.
+    """
+
+    method = "liveChatMessages.list"
+
+    def __init__(
+        self,
+        quota: QuotaTracker | None = None,
+        min_interval: float = MIN_POLL_INTERVAL,
+        max_interval: float = MAX_POLL_INTERVAL,
+        pollers: int = 1,
+        burst: float = QUOTA_BURST,
+        clock=time.monotonic,
+    ):
+        self.quota = quota or quota_tracker
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.pollers = pollers
+        self.burst = burst
+        self.message_rate = 0.0  # smoothed messages/sec
+        self._clock = clock
+        self._idle_polls = 0
+        self._last_poll = None
+        self._credit = burst  # seconds banked against the quota pace
+
+    def next_delay(self, server_hint_ms: int | None, item_count: int, api_keys: Iterable[str]) -> float:
+        now = self._clock()
+        pace = self.quota.min_interval(api_keys, self.method, self.pollers)
+        if self._last_poll is not None:
+            elapsed = max(now - self._last_poll, 1e-3)
+            sample = item_count / elapsed
+            self.message_rate += RATE_SMOOTHING * (sample - self.message_rate)
+            self._credit = min(self.burst, self._credit + elapsed - pace)
+        self._last_poll = now
+
+        hint = server_hint_ms / 1000 if server_hint_ms else DEFAULT_POLL_INTERVAL
+        floor = max(self.min_interval, hint)
+
+        if item_count or self.message_rate * floor >= 1:
+            self._idle_polls = 0
+            delay = floor
+        else:
+            self._idle_polls += 1
+            delay = min(self.max_interval, floor * IDLE_BACKOFF ** self._idle_polls)
+
+        # Never wait less than it takes to get the bank back to zero
+        return max(delay, pace - self._credit)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Tuple
+
+from storage import cached_probe_results, save_probe_results
+
+# Seconds each kind of probe result stays valid on disk
+PROBE_TTLS = {
+    "verify_key": 10 * 60,
+    "live_video": 2 * 60,
+    "live_chat_id": 30 * 60,
+}
+DEFAULT_TTL = 5 * 60
+
+_lock = threading.Lock()
+
+
+def _entry_key(kind: str, parts: Tuple[Any, ...]) -> str:
+    # Hash the inputs so API keys never end up in the cache file in clear text
+    digest = hashlib.sha256("\0".join(str(part) for part in parts).encode("utf-8"))
+    return f"{kind}:{digest.hexdigest()[:16]}"
+
+
+def get(kind: str, *parts: Any) -> Tuple[bool, Any]:
+    """Return (hit, value) for an unexpired probe result."""
+    entry = cached_probe_results().get(_entry_key(kind, parts))
+    if entry and entry.get("expires", 0) > time.time():
+        return True, entry.get("value")
+    return False, None
+
+
+def put(kind: str, value: Any, *parts: Any) -> None:
+    now = time.time()
+    with _lock:
+        results = {
+            key: entry
+            for key, entry in cached_probe_results().items()
+            if entry.get("expires", 0) > now
+        }
+        results[_entry_key(kind, parts)] = {
+            "value": value,
+            "expires": now + PROBE_TTLS.get(kind, DEFAULT_TTL),
+        }
+        save_probe_results(results)
+
+
+def cached(
+    kind: str,
+    parts: Tuple[Any, ...],
+    probe: Callable[[], Any],
+    should_cache: Callable[[Any], bool] = lambda value: value is not None,
+) -> Any:
+    """Return a fresh cached result for (kind, parts) or run probe and store it."""
+    hit, value = get(kind, *parts)
+    if hit:
+        return value
+    value = probe()
+    if should_cache(value):
+        put(kind, value, *parts)
+    return value
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Hashable, Mapping, NamedTuple, Optional
+
+
+class Limit(NamedTuple):
+    capacity: float
+    refill_per_second: float
+
+
+# Budgets shared by every chat command. The per-command scope comes from the
+# "timeout" field in commands.json instead (one use per timeout window).
+DEFAULT_LIMITS: Dict[str, Dict[str, Limit]] = {
+    "global": {"*": Limit(capacity=10, refill_per_second=2.0)},
+    # Per-user budget, chosen by the user's access tier
+    "user": {
+        "regular": Limit(capacity=3, refill_per_second=1 / 10),
+        "patreon": Limit(capacity=5, refill_per_second=1 / 5),
+        "superchat": Limit(capacity=10, refill_per_second=1.0),
+    },
+    # Budget shared by everyone in the same tier
+    "tier": {
+        "regular": Limit(capacity=6, refill_per_second=1 / 2),
+        "patreon": Limit(capacity=10, refill_per_second=1.0),
+        "superchat": Limit(capacity=20, refill_per_second=5.0),
+    },
+}
+
+
+
+def limits_from_config(config: Optional[Mapping[str, Any]]) -> Dict[str, Dict[str, Limit]]:
+    """
+    Overlay the "rate_limits" section of secrets.json on DEFAULT_LIMITS, e.g.
+    {"user": {"regular": {"capacity": 2, "refill_per_second": 0.05}}}.
+    Malformed entries are reported and the default is kept.
+    """
+    limits = {scope: dict(entries) for scope, entries in DEFAULT_LIMITS.items()}
+    for scope, entries in (config or {}).items():
+        if scope not in limits or not isinstance(entries, Mapping):
+            print(f"Ignoring unknown rate limit scope: {scope}")
+            continue
+        for key, spec in entries.items():
+            try:
+                limits[scope][key] = Limit(float(spec["capacity"]), float(spec["refill_per_second"]))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Ignoring rate limit {scope}/{key}: {e}")
+    return limits
+
+
+IDLE_TTL = 600  # seconds before a full, unused bucket is forgotten
+SWEEP_INTERVAL = 60
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated", "limit")
+
+    def __init__(self, limit: Limit, now: float):
+        self.limit = limit
+        self.tokens = limit.capacity
+        self.updated = now
+
+    def refill(self, now: float) -> float:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(
+                self.limit.capacity, self.tokens + elapsed * self.limit.refill_per_second
+            )
+            self.updated = now
+        return self.tokens
+
+    def retry_after(self) -> float:
+        if self.limit.refill_per_second <= 0:
+            return float("inf")
+        return (1 - self.tokens) / self.limit.refill_per_second
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    scope: Optional[str] = None
+    retry_after: float = 0.0
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter checked across the global, per-command, per-user and
+    per-tier scopes at once. A request only consumes tokens when every scope
+    allows it, so a rejected spammer does not drain the shared budgets.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Limit]]] = None, clock=time.monotonic):
+        self.limits = limits or DEFAULT_LIMITS
+        self._clock = clock
+        self._buckets: Dict[tuple, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = clock()
+        self.counters: Counter = Counter()
+
+    def configure(self, limits: Dict[str, Dict[str, Limit]]) -> None:
+        """Swap in new budgets; existing buckets keep their tokens."""
+        with self._lock:
+            self.limits = limits
+
+    def _bucket(self, scope: str, key: Hashable, limit: Limit, now: float) -> TokenBucket:
+        bucket = self._buckets.get((scope, key))
+        if bucket is None:
+            bucket = self._buckets[(scope, key)] = TokenBucket(limit, now)
+        elif bucket.limit != limit:
+            # A user changing tier (or new budgets) keeps what is left of the
+            # old allowance instead of starting over with a full bucket
+            bucket.refill(now)
+            bucket.limit = limit
+            bucket.tokens = min(bucket.tokens, limit.capacity)
+        return bucket
+
+    def acquire(self, command: str, timeout: float, user: str, tier: str) -> Decision:
+        now = self._clock()
+        scopes = []
+        global_limit = self.limits.get("global", {}).get("*")
+        if global_limit:
+            scopes.append(("global", "*", global_limit))
+        if timeout and timeout > 0:
+            scopes.append(("command", command, Limit(1, 1 / timeout)))
+        user_limit = self.limits.get("user", {}).get(tier)
+        if user_limit:
+            scopes.append(("user", user.casefold(), user_limit))
+        tier_limit = self.limits.get("tier", {}).get(tier)
+        if tier_limit:
+            scopes.append(("tier", tier, tier_limit))
+
+        with self._lock:
+            if now - self._last_sweep >= SWEEP_INTERVAL:
+                self._sweep(now)
+            buckets = []
+            for scope, key, limit in scopes:
+                bucket = self._bucket(scope, key, limit, now)
+                if bucket.refill(now) < 1:
+                    self.counters[f"rejected_{scope}"] += 1
+                    return Decision(False, scope, bucket.retry_after())
+                buckets.append(bucket)
+            for bucket in buckets:
+                bucket.tokens -= 1
+            self.counters["allowed"] += 1
+            return Decision(True)
+
+    def _sweep(self, now: float) -> None:
+        """Forget buckets that are idle and full again; they cost nothing to recreate."""
+        idle = [
+            key
+            for key, bucket in self._buckets.items()
+            if now - bucket.updated >= IDLE_TTL
+            and bucket.refill(now) >= bucket.limit.capacity
+        ]
+        for key in idle:
+            del self._buckets[key]
+        self.counters["evicted"] += len(idle)
+        self._last_sweep = now
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["buckets"] = len(self._buckets)
+            return stats
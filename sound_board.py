@@ -1,29 +1,167 @@
-import pygame
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
+import pygame
+
 
 SOUNDS_DIR = Path(__file__).resolve().parent / "sounds"
 
+MIXER_FREQUENCY = 22050
+MIXER_SIZE = -16
+MIXER_CHANNELS = 2
+MIXER_BUFFER = 4096
+MIXER_VOICES = 16
+RESERVED_CHANNELS = 1  # channels below this are never handed out by find_channel()
+TTS_CHANNEL = 0  # the reserved channel; TTS playback uses it directly
+CACHE_LIMIT_BYTES = 64 * 1024 * 1024
+
+_mixer_lock = threading.Lock()
+
+
+def ensure_mixer():
+    """
+    Initialise the mixer once for the whole process.
+    Falls back to SDL's dummy audio driver when no audio device is available,
+    which also lets the sound board run headless.
+    """
+    if pygame.mixer.get_init():
+        return
+    with _mixer_lock:
+        if pygame.mixer.get_init():
+            return
+        try:
+            pygame.mixer.init(
+                frequency=MIXER_FREQUENCY,
+                size=MIXER_SIZE,
+                channels=MIXER_CHANNELS,
+                buffer=MIXER_BUFFER,
+            )
+        except pygame.error as e:
+            print(f"No audio device available ({e}); using SDL dummy audio driver.")
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+            pygame.mixer.init(
+                frequency=MIXER_FREQUENCY,
+                size=MIXER_SIZE,
+                channels=MIXER_CHANNELS,
+                buffer=MIXER_BUFFER,
+            )
+        pygame.mixer.set_num_channels(MIXER_VOICES)
+        pygame.mixer.set_reserved(RESERVED_CHANNELS)
+
+
+def _sound_bytes(sound):
+    """Approximate decoded size of a Sound without copying its buffer."""
+    frequency, size, channels = pygame.mixer.get_init()
+    return int(sound.get_length() * frequency * channels * abs(size) // 8)
+
+
+class SoundCache:
+    """
+    LRU cache of decoded pygame Sound objects bounded by their decoded size.
+    The file index is rebuilt only when the sounds folder changes.
+    """
+
+    def __init__(self, sounds_dir=SOUNDS_DIR, limit_bytes=CACHE_LIMIT_BYTES):
+        self.sounds_dir = Path(sounds_dir)
+        self.limit_bytes = limit_bytes
+        self._sounds = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._index = {}
+        self._index_mtime = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
 
-def _build_sound_index():
-    """Return a mapping of sound command names to file paths."""
-    return {path.stem.lower(): path for path in SOUNDS_DIR.glob("*.mp3")}
+    def _refresh_index(self):
+        try:
+            mtime = self.sounds_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._index_mtime:
+            return
+        if mtime is None:
+            index = {}
+        else:
+            index = {path.stem.lower(): path for path in self.sounds_dir.glob("*.mp3")}
+        self._index = index
+        self._index_mtime = mtime
+        # Drop decoded sounds whose file disappeared
+        for name in [name for name in self._sounds if name not in index]:
+            self._evict(name)
+
+    def _evict(self, name):
+        self._sounds.pop(name, None)
+        self._bytes -= self._sizes.pop(name, 0)
+
+    def get(self, sound_name):
+        """Return the decoded Sound for a name, or None if there is no such file."""
+        name = sound_name.lower()
+        with self._lock:
+            self._refresh_index()
+            sound = self._sounds.get(name)
+            if sound is not None:
+                self._sounds.move_to_end(name)
+                self.hits += 1
+                return sound
+
+            path = self._index.get(name)
+            if path is None:
+                return None
+            self.misses += 1
+            sound = pygame.mixer.Sound(str(path))
+            size = _sound_bytes(sound)
+            self._sounds[name] = sound
+            self._sizes[name] = size
+            self._bytes += size
+            while self._bytes > self.limit_bytes and len(self._sounds) > 1:
+                self._evict(next(iter(self._sounds)))
+            return sound
+
+    def preload(self):
+        """Decode every sound up to the memory cap."""
+        with self._lock:
+            self._refresh_index()
+            names = list(self._index)
+        for name in names:
+            self.get(name)
+            if self._bytes >= self.limit_bytes:
+                break
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "cached": len(self._sounds),
+                "bytes": self._bytes,
+                "limit_bytes": self.limit_bytes,
+            }
+
+
+sound_cache = SoundCache()
+
+
+def preload_sounds():
+    ensure_mixer()
+    sound_cache.preload()
 
 
 def play_sound(sound_name):
-    pygame.init()
-    pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=4096)
+    """Start a sound on a free mixer channel and return without waiting for it."""
     try:
-        sound_map = _build_sound_index()
-        sound_file = sound_map.get(sound_name.lower())
-        if not sound_file:
+        ensure_mixer()
+        sound = sound_cache.get(sound_name)
+        if sound is None:
             print(f"No sound found for '{sound_name}'")
             return
 
-        sound = pygame.mixer.Sound(str(sound_file))
-        sound.play()
-
-        while pygame.mixer.get_busy():
-            pygame.time.wait(100)
+        channel = pygame.mixer.find_channel()
+        if channel is None:
+            print(f"No free channel to play '{sound_name}'")
+            return
+        channel.play(sound)
     except Exception as e:
         print(f"Error playing sound: {e}")
@@ -0,0 +1,187 @@
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Deque, Dict, List, Optional
+
+TIERS = ("superchat", "patreon", "regular")  # highest priority first
+DEFAULT_TIER = "regular"
+
+# Seconds an item may wait before it is too stale to read out (None = forever)
+MAX_AGE = {
+    "superchat": None,
+    "patreon": 180.0,
+    "regular": 60.0,
+}
+
+SAID = " said: "  # how chat messages are phrased for TTS
+WAIT_SAMPLES = 200
+
+_RUNS = re.compile(r"(.)\1{2,}")  # three or more; "good" and "god" must differ
+_TRAILING = re.compile(r"[\s!?.,~]+$")
+
+
+def spam_key(text: str) -> str:
+    """Reduce text so near-identical spam ("LOL", "lol!!!", "loooool") compares equal."""
+    text = " ".join(text.casefold().split())
+    text = _RUNS.sub(r"\1", text)
+    return _TRAILING.sub("", text)
+
+
+class SpeechItem:
+    __slots__ = ("text", "newtts", "user", "tier", "enqueued_at", "body", "others", "key")
+
+    def __init__(self, text, newtts, user, tier, enqueued_at):
+        self.text = text
+        self.newtts = newtts
+        self.user = user
+        self.tier = tier
+        self.enqueued_at = enqueued_at
+        # The message itself without the "<user> said: " lead-in, if it has one
+        prefix = f"{user}{SAID}" if user else None
+        self.body = text[len(prefix):] if prefix and text.startswith(prefix) else None
+        self.others: List[str] = []
+        self.key = (tier, newtts, spam_key(self.body if self.body is not None else text))
+
+    def spoken_text(self) -> str:
+        if not self.others or self.body is None:
+            return self.text
+        if len(self.others) == 1:
+            return f"{self.user} and {self.others[0]}{SAID}{self.body}"
+        return f"{self.user} and {len(self.others)} others{SAID}{self.body}"
+
+
+class SpeechQueue:
+    """
+    TTS queue ordered by tier, then round-robin between users within a tier.
+    A message that repeats one already waiting in the same tier is folded
+    into it instead of being read out again, and items older than their
+    tier's MAX_AGE are dropped when they reach the front.
+    """
+
+    def __init__(self, max_age: Optional[Dict[str, Optional[float]]] = None, clock=time.monotonic):
+        self.max_age = dict(MAX_AGE if max_age is None else max_age)
+        self._clock = clock
+        self._cond = threading.Condition()
+        # tier -> user -> that user's items, users in round-robin order
+        self._tiers: Dict[str, "OrderedDict[str, Deque[SpeechItem]]"] = {tier: OrderedDict() for tier in TIERS}
+        self._by_key: Dict[tuple, SpeechItem] = {}
+        self._size = 0
+        self._unfinished = 0
+        self._closed = False
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.counters: Counter = Counter()
+
+    def put(self, text: str, newtts: bool = True, user: Optional[str] = None, tier: str = DEFAULT_TIER) -> None:
+        if tier not in self._tiers:
+            tier = DEFAULT_TIER
+        with self._cond:
+            item = SpeechItem(text, newtts, user, tier, self._clock())
+            queued = self._by_key.get(item.key)
+            if queued is not None:
+                if user and user != queued.user and user not in queued.others:
+                    queued.others.append(user)
+                self.counters["coalesced"] += 1
+                return
+
+            self._by_key[item.key] = item
+            self._tiers[tier].setdefault(user or "", deque()).append(item)
+            self._size += 1
+            self._unfinished += 1
+            self.counters["queued"] += 1
+            self._cond.notify()
+
+    def _pop(self) -> Optional[SpeechItem]:
+        """Take the next unexpired item, or None if nothing is waiting."""
+        now = self._clock()
+        for tier in TIERS:
+            users = self._tiers[tier]
+            max_age = self.max_age.get(tier)
+            while users:
+                user, items = next(iter(users.items()))
+                item = items.popleft()
+                if items:
+                    users.move_to_end(user)
+                else:
+                    del users[user]
+                self._size -= 1
+                self._forget(item)
+                if max_age is not None and now - item.enqueued_at > max_age:
+                    self._unfinished -= 1
+                    self.counters["expired"] += 1
+                    continue
+                self._waits.append(now - item.enqueued_at)
+                return item
+        return None
+
+    def _forget(self, item: SpeechItem) -> None:
+        if self._by_key.get(item.key) is item:
+            del self._by_key[item.key]
+
+    def get(self) -> Optional[SpeechItem]:
+        """Block for the next item; returns None once the queue is closed."""
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                item = self._pop()
+                if item is not None:
+                    return item
+                if not self._unfinished:
+                    self._cond.notify_all()  # wake join() after expiries
+                self._cond.wait()
+
+    def task_done(self) -> None:
+        with self._cond:
+            self._unfinished -= 1
+            if self._unfinished <= 0:
+                self._cond.notify_all()
+
+    def join(self) -> None:
+        with self._cond:
+            while self._unfinished > 0 and not self._closed:
+                self._cond.wait()
+
+    def clear(self) -> int:
+        """Drop everything waiting and return how many items that was."""
+        with self._cond:
+            dropped = self._size
+            for users in self._tiers.values():
+                users.clear()
+            self._by_key.clear()
+            self._size = 0
+            self._unfinished -= dropped
+            self.counters["cleared"] += dropped
+            self._cond.notify_all()
+            return dropped
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def pending_chars(self) -> int:
+        """Characters of text waiting to be spoken, for backlog estimates."""
+        with self._cond:
+            return sum(
+                len(item.spoken_text())
+                for users in self._tiers.values()
+                for items in users.values()
+                for item in items
+            )
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            waits = sorted(self._waits)
+            depth = {tier: sum(len(items) for items in users.values()) for tier, users in self._tiers.items()}
+            stats: Dict[str, object] = dict(self.counters)
+            stats["depth"] = self._size
+            stats["depth_by_tier"] = depth
+            if waits:
+                stats["wait_avg"] = round(sum(waits) / len(waits), 3)
+                stats["wait_p95"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3)
+                stats["wait_max"] = round(waits[-1], 3)
+            return stats
@@ -1,6 +1,13 @@
+import atexit
+import copy
 import json
+import os
+import stat
+import tempfile
+import threading
+import time
 from pathlib import Path
-from typing import Any, Callable, Dict, List, MutableMapping, MutableSequence
+from typing import Any, Callable, Dict, Hashable, List, MutableMapping, MutableSequence
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -8,56 +15,314 @@ SECRETS_PATH = BASE_DIR / "secrets.json"
 COMMANDS_PATH = BASE_DIR / "commands.json"
 PLAQUES_PATH = BASE_DIR / "plaques.json"
 SOUNDS_PATH = BASE_DIR / "sounds"
+PROBE_CACHE_PATH = BASE_DIR / "probe_cache.json"
+
+# Saves within this window are coalesced into one write of the latest payload
+WRITE_DELAY = 0.5  # seconds
+WRITE_RETRY_MAX = 30.0  # longest wait, in seconds, before retrying a failed write
 
 
 JsonDocument = Dict[str, Any] | MutableMapping[str, Any]
 JsonArray = List[Any] | MutableSequence[Any]
 DefaultFactory = Callable[[], Any]
+Signature = Hashable
+
+
+class _DocumentCache:
+    """
+    Keep parsed JSON documents in memory until their backing files change.
+    Entries are validated against a signature (mtime/size of the inputs) on
+    every lookup, so edits made outside the process are still picked up.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Hashable, tuple[Signature, Any]] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, signature: Signature, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            value = loader()
+            self._entries[key] = (signature, value)
+            return value
+
+    def put(self, key: Hashable, signature: Signature, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (signature, value)
+
+    def resign(self, key: Hashable, value: Any, signature: Signature) -> None:
+        """Give an entry a new signature if it still holds exactly value."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is value:
+                self._entries[key] = (signature, value)
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
+
+_cache = _DocumentCache()
+
+
+def _stat_signature(path: Path) -> tuple[int, int] | None:
+    """Return (mtime_ns, size) for a path, or None when it does not exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def cache_stats() -> Dict[str, int]:
+    """Return hit/miss counters for the in-memory config cache."""
+    return _cache.stats()
+
+
+def invalidate_cache() -> None:
+    """Drop every cached document so the next read goes back to disk."""
+    _cache.invalidate()
 
 
 def _read_json(path: Path, default: DefaultFactory | Any) -> Any:
     """
     Read JSON from disk returning a defensive default when the file is missing.
     The default can be either a value or a callable that returns a value.
+    A save still waiting to be written wins over the file on disk.
     """
+    with _pending_lock:
+        if path in _pending:
+            return copy.deepcopy(_pending[path])
     if path.exists():
         with path.open("r", encoding="utf-8") as source:
             return json.load(source)
     return default() if callable(default) else default
 
 
+# Serialises every write to disk in this process
+_write_lock = threading.RLock()
+
+# mkstemp creates 0600 files; new documents get the usual umask-based mode instead
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(path: Path) -> int:
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
 def _write_json(path: Path, payload: Any) -> None:
-    """Persist JSON with utf-8 encoding and a consistent indent."""
-    with path.open("w", encoding="utf-8") as target:
-        json.dump(payload, target, indent=4)
+    """
+    Persist JSON with utf-8 encoding and a consistent indent.
+    The document goes to a temp file in the same folder that is fsynced and
+    then renamed over the target, so readers see the old file or the new
+    one, never a partial write.
+    """
+    data = json.dumps(payload, indent=4)
+    with _write_lock:
+        fd, temp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as target:
+                target.write(data)
+                target.flush()
+                os.fsync(target.fileno())
+            # Keep the document's permissions rather than the temp file's
+            os.chmod(temp_path, _file_mode(path))
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+
+# Write-behind queue: path -> latest payload not yet on disk
+_pending: Dict[Path, Any] = {}
+_pending_lock = threading.Condition()
+_flush_at: float | None = None
+_writer: threading.Thread | None = None
+_failed_flushes = 0  # consecutive flushes that left a write behind
+_write_counts = {"saves": 0, "writes": 0, "errors": 0}
+
+
+def _signature_for(path: Path) -> Signature:
+    return _commands_signature() if path == COMMANDS_PATH else _stat_signature(path)
+
+
+def _write_behind(path: Path, payload: Any) -> None:
+    """Queue payload for path; saves inside WRITE_DELAY cost a single write."""
+    global _flush_at, _writer
+    with _pending_lock:
+        _pending[path] = payload
+        _write_counts["saves"] += 1
+        if _flush_at is None:
+            _flush_at = time.monotonic() + WRITE_DELAY
+        if _writer is None:
+            _writer = threading.Thread(target=_run_writer, name="storage-writer", daemon=True)
+            _writer.start()
+        _pending_lock.notify()
+
+
+def _run_writer() -> None:
+    while True:
+        with _pending_lock:
+            while _flush_at is None:
+                _pending_lock.wait()
+            delay = _flush_at - time.monotonic()
+            if delay > 0:
+                _pending_lock.wait(delay)
+                continue
+        flush_pending()
+
+
+def flush_pending() -> None:
+    """Write every pending save to disk now; failed writes are retried with backoff."""
+    global _flush_at, _failed_flushes
+    with _write_lock:
+        with _pending_lock:
+            batch = dict(_pending)
+            _flush_at = None
+        failed = False
+        for path, payload in batch.items():
+            try:
+                _write_json(path, payload)
+                _write_counts["writes"] += 1
+            except OSError as e:
+                _write_counts["errors"] += 1
+                print(f"Error writing {path.name}: {e}")
+                failed = True
+                continue
+            with _pending_lock:
+                if _pending.get(path) is payload:
+                    del _pending[path]
+            # The cache already holds payload; match it to the file just written
+            _cache.resign(path, payload, _signature_for(path))
+            if path == PLAQUES_PATH:
+                _cache.invalidate("plaque_index")
+        with _pending_lock:
+            if not failed:
+                _failed_flushes = 0
+                return
+            # The failed payloads are still in _pending; try them again later
+            _failed_flushes += 1
+            retry_at = time.monotonic() + min(WRITE_RETRY_MAX, WRITE_DELAY * 2 ** _failed_flushes)
+            if _flush_at is None or _flush_at > retry_at:
+                _flush_at = retry_at
+            _pending_lock.notify()
+
+
+def persistence_stats() -> Dict[str, int]:
+    with _pending_lock:
+        return dict(_write_counts, pending=len(_pending))
+
+
+# Saves still inside their window must not be lost on a normal exit
+atexit.register(flush_pending)
+
+
+def _save_cached(path: Path, payload: Any) -> None:
+    """Queue a document for writing and update its cache entry right away."""
+    payload = copy.deepcopy(payload)
+    # Until the write lands the file is unchanged, so key the entry to it
+    _cache.put(path, _signature_for(path), payload)
+    _write_behind(path, payload)
+    if path == PLAQUES_PATH:
+        _cache.invalidate("plaque_index")
+
+
+def cached_secrets() -> JsonDocument:
+    """Return the shared cached secrets document. Treat it as read-only."""
+    return _cache.get(
+        SECRETS_PATH,
+        _stat_signature(SECRETS_PATH),
+        lambda: _read_json(SECRETS_PATH, dict),
+    )
 
 
 def load_secrets() -> JsonDocument:
-    return _read_json(SECRETS_PATH, dict)
+    return copy.deepcopy(cached_secrets())
 
 
 def save_secrets(secrets: JsonDocument) -> None:
-    _write_json(SECRETS_PATH, secrets)
+    _save_cached(SECRETS_PATH, secrets)
 
 
-def load_commands() -> JsonDocument:
+def _load_synced_commands() -> JsonDocument:
     commands = _read_json(COMMANDS_PATH, dict)
     commands, changed = sync_sound_commands(commands)
     if changed:
-        _write_json(COMMANDS_PATH, commands)
+        _write_behind(COMMANDS_PATH, commands)
     return commands
 
 
+def _commands_signature() -> Signature:
+    # The sounds folder takes part in the signature because adding or removing
+    # an mp3 changes the synced command list even if commands.json does not.
+    return _stat_signature(COMMANDS_PATH), _stat_signature(SOUNDS_PATH)
+
+
+def cached_commands() -> JsonDocument:
+    """Return the shared cached commands document. Treat it as read-only."""
+    return _cache.get(COMMANDS_PATH, _commands_signature(), _load_synced_commands)
+
+
+def load_commands() -> JsonDocument:
+    return copy.deepcopy(cached_commands())
+
+
 def save_commands(commands: JsonDocument) -> None:
-    _write_json(COMMANDS_PATH, commands)
+    _save_cached(COMMANDS_PATH, commands)
+
+
+def cached_plaques() -> JsonArray:
+    """Return the shared cached plaque list. Treat it as read-only."""
+    return _cache.get(
+        PLAQUES_PATH,
+        _stat_signature(PLAQUES_PATH),
+        lambda: _read_json(PLAQUES_PATH, list),
+    )
 
 
 def load_plaques() -> JsonArray:
-    return _read_json(PLAQUES_PATH, list)
+    return copy.deepcopy(cached_plaques())
 
 
 def save_plaques(plaques: JsonArray) -> None:
-    _write_json(PLAQUES_PATH, plaques)
+    _save_cached(PLAQUES_PATH, plaques)
+
+
+def cached_probe_results() -> JsonDocument:
+    """Return the shared cached startup probe results. Treat it as read-only."""
+    return _cache.get(
+        PROBE_CACHE_PATH,
+        _stat_signature(PROBE_CACHE_PATH),
+        lambda: _read_json(PROBE_CACHE_PATH, dict),
+    )
+
+
+def save_probe_results(results: JsonDocument) -> None:
+    _save_cached(PROBE_CACHE_PATH, results)
 
 
 def update_plaque(yt_name: str, leds_colour: str, leds: str) -> None:
@@ -79,15 +344,30 @@ def update_plaque(yt_name: str, leds_colour: str, leds: str) -> None:
     save_plaques(plaques)
 
 
+def _build_plaque_index() -> Dict[str, JsonDocument]:
+    """Map case-folded YouTube and Twitch names to their plaque record."""
+    index: Dict[str, JsonDocument] = {}
+    for plaque in cached_plaques():
+        for field in ("YT_Name", "twitchusername"):
+            name = plaque.get(field)
+            if name:
+                # setdefault keeps the first matching plaque, like the old scan
+                index.setdefault(name.casefold(), plaque)
+    return index
+
+
+def plaque_index() -> Dict[str, JsonDocument]:
+    """Return the username index, rebuilt only when plaques.json changes."""
+    return _cache.get(
+        "plaque_index",
+        _stat_signature(PLAQUES_PATH),
+        _build_plaque_index,
+    )
+
+
 def find_plaque(display_name: str) -> JsonDocument | None:
     """Return the first plaque that matches a YouTube or Twitch username."""
-    display_name_lower = display_name.lower()
-    for plaque in load_plaques():
-        yt = plaque.get("YT_Name", "").lower()
-        twitch = plaque.get("twitchusername", "").lower()
-        if display_name_lower in (yt, twitch):
-            return plaque
-    return None
+    return plaque_index().get(display_name.casefold())
 
 
 def _discover_sound_commands() -> Dict[str, Path]:
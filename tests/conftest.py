@@ -0,0 +1,52 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# The bot's modules live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class FakeClock:
+    """Monotonic clock stand-in; tests move it by setting .now."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
+
+
+class StopListening(Exception):
+    """Raised from a recorded sleep to end a chat listener's endless loop."""
+
+
+class SleepRecorder:
+    def __init__(self, limit):
+        self.limit = limit
+        self.delays = []
+        self._thread = threading.current_thread()
+        self._sleep = time.sleep
+
+    def __call__(self, seconds):
+        # Background threads from other modules keep sleeping for real
+        if threading.current_thread() is not self._thread:
+            return self._sleep(seconds)
+        self.delays.append(seconds)
+        if len(self.delays) >= self.limit:
+            raise StopListening
+
+
+@pytest.fixture
+def recorded_sleeps(monkeypatch):
+    """Record the test thread's sleeps instead of waiting; the limit-th one (default 4) ends the loop."""
+    recorder = SleepRecorder(limit=4)
+    monkeypatch.setattr(time, "sleep", recorder)
+    return recorder
@@ -0,0 +1,18 @@
+import pytest
+
+from action_registry import ActionRegistry, LedAction, parse_action
+
+
+def test_led_index_out_of_range_is_rejected():
+    for leds in ("-1,2", "2,70000"):
+        with pytest.raises(ValueError):
+            parse_action("!party", {"type": "led", "leds": leds, "colour": "#ff00ff"})
+
+
+def test_bad_led_spec_only_drops_that_command():
+    registry = ActionRegistry({
+        "!party": {"action": {"type": "led", "leds": "-1,2", "colour": "#ff00ff"}},
+        "!disco": {"action": {"type": "led", "leds": "1,2,3", "colour": "#ff00ff"}},
+    })
+    assert registry.get("!party") is None
+    assert isinstance(registry.get("!disco"), LedAction)
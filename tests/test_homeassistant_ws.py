@@ -0,0 +1,83 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("websocket")
+
+import homeassistant_controls
+from action_registry import ActionRegistry
+from actuator_scheduler import ActuatorScheduler
+from fake_homeassistant import start_fake_server
+from homeassistant_controls import DESK_HEIGHT_ENTITY_ID, DESK_STOP_ENTITY_ID, HomeAssistantClient
+from homeassistant_ws import HomeAssistantWebSocket, HomeAssistantWebSocketError
+
+TOKEN = "test-token"
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def server():
+    server = start_fake_server(token=TOKEN, states={DESK_HEIGHT_ENTITY_ID: 80})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def ws(server):
+    ws = HomeAssistantWebSocket(server.url, TOKEN, [DESK_HEIGHT_ENTITY_ID])
+    ws.start()
+    assert wait_for(lambda: ws.state(DESK_HEIGHT_ENTITY_ID) is not None)
+    yield ws
+    ws.close()
+
+
+def test_auth_handshake(server):
+    rejected = HomeAssistantWebSocket(server.url, "wrong-token")
+    with pytest.raises(HomeAssistantWebSocketError, match="authentication failed"):
+        rejected._connect()
+    assert not rejected.connected
+
+
+def test_initial_states_are_loaded(ws):
+    assert ws.connected
+    assert ws.state(DESK_HEIGHT_ENTITY_ID)["state"] == "80"
+
+
+def test_call_service_round_trip(server, ws):
+    assert ws.call_service("cover/stop_cover", {"entity_id": DESK_STOP_ENTITY_ID})
+    assert server.calls == [("cover/stop_cover", {"entity_id": DESK_STOP_ENTITY_ID})]
+
+
+def test_state_changed_updates_cache(server, ws):
+    server.apply_service("number/set_value", {"entity_id": DESK_HEIGHT_ENTITY_ID, "value": 95})
+    assert wait_for(lambda: ws.state(DESK_HEIGHT_ENTITY_ID)["state"] == "95.0")
+
+
+def test_desk_command_skipped_at_target_height(server, monkeypatch):
+    secrets = {"ha_url": server.url, "access_token": TOKEN, "ha_transport": "websocket"}
+    client = HomeAssistantClient()
+    monkeypatch.setattr(homeassistant_controls, "cached_secrets", lambda: secrets)
+    monkeypatch.setattr(homeassistant_controls, "ha_client", client)
+    monkeypatch.setattr(homeassistant_controls, "actuators", ActuatorScheduler(dispatch=client.submit))
+    monkeypatch.setattr(homeassistant_controls, "DESK_SETTLE", 0.01)
+    assert wait_for(lambda: client.state(DESK_HEIGHT_ENTITY_ID) is not None)
+
+    desk = ActionRegistry({"!desk": {}}).get("!desk")
+    desk.run(SimpleNamespace(text="!desk 80", args="80"), "viewer")
+    time.sleep(0.2)
+    assert server.calls == []
+
+    desk.run(SimpleNamespace(text="!desk 90", args="90"), "viewer")
+    assert wait_for(lambda: ("number/set_value", {"entity_id": DESK_HEIGHT_ENTITY_ID, "value": 90}) in server.calls)
+    assert server.calls[0] == ("cover/stop_cover", {"entity_id": DESK_STOP_ENTITY_ID})
+    client._ws.close()
@@ -0,0 +1,33 @@
+import pytest
+
+import plaque_board_controller
+from plaque_board_controller import compile_plaque, parse_colour
+
+
+def test_short_colours_are_expanded():
+    assert compile_plaque("5,6,7,9", "#FFF").hex_colour == "ffffff"
+    assert parse_colour("#f80") == 0xFF8800
+    assert parse_colour("#12ab9C") == 0x12AB9C
+
+
+@pytest.mark.parametrize("colour", ["#FFFF", "#1234567", "#GGGGGG", ""])
+def test_malformed_colours_are_rejected(colour):
+    with pytest.raises(ValueError):
+        parse_colour(colour)
+
+
+def test_twitch_only_plaques_do_not_share_a_key(monkeypatch):
+    highlights = []
+    monkeypatch.setattr(
+        plaque_board_controller.compositor, "highlight", lambda key, *args: highlights.append(key)
+    )
+    first = {"YT_Name": "", "twitchusername": "FirstViewer", "Leds": "1,2", "Leds_colour": "#ff0000"}
+    second = {"YT_Name": "", "twitchusername": "second_viewer", "Leds": "3,4", "Leds_colour": "#00ff00"}
+
+    assert plaque_board_controller.compiled_plaque(first).hex_colour == "ff0000"
+    assert plaque_board_controller.compiled_plaque(second).hex_colour == "00ff00"
+    assert plaque_board_controller.compiled_plaque(first).hex_colour == "ff0000"
+
+    plaque_board_controller.trigger_plaque(first)
+    plaque_board_controller.trigger_plaque(second)
+    assert highlights == ["firstviewer", "second_viewer"]
@@ -0,0 +1,97 @@
+import pytest
+
+import main
+import poll_scheduler
+from conftest import StopListening
+from mock_youtube_server import MOCK_CHAT_ID, start_mock_server
+from poll_scheduler import PollScheduler, QuotaTracker
+from youtube_utils import ApiKeyPool, YouTubeClientPool
+
+
+class FakeQuota:
+    """A budget that allows one poll every `pace` seconds on average."""
+
+    def __init__(self, pace):
+        self.pace = pace
+
+    def min_interval(self, api_keys, method, pollers=1):
+        return self.pace
+
+
+def poll(scheduler, clock, items, hint_ms=5000):
+    delay = scheduler.next_delay(hint_ms, items, ["key"])
+    clock.now += delay
+    return delay
+
+
+def test_busy_idle_busy_polls_at_server_hint(fake_clock):
+    # One key over four hours: 10000 units / 5 per call -> 7.2s average
+    scheduler = PollScheduler(quota=FakeQuota(7.2), burst=60.0, clock=fake_clock)
+
+    busy = [poll(scheduler, fake_clock, items=3) for _ in range(5)]
+    assert busy == [5.0] * 5  # banked credit covers the burst
+
+    # A long busy stretch uses the bank up and settles at the quota pace
+    for _ in range(100):
+        delay = poll(scheduler, fake_clock, items=3)
+    assert delay == pytest.approx(7.2)
+
+    idle = [poll(scheduler, fake_clock, items=0) for _ in range(8)]
+    assert idle[-1] == 30.0  # backed off to the cap once the rate decayed
+
+    # Quiet polling refilled the bank, so the next burst runs at the hint again
+    busy_again = [poll(scheduler, fake_clock, items=3) for _ in range(5)]
+    assert busy_again == [5.0] * 5
+
+
+def test_quota_never_overspent_over_time(fake_clock):
+    scheduler = PollScheduler(quota=FakeQuota(7.2), burst=60.0, clock=fake_clock)
+    polls = 0
+    while fake_clock.now < 3600:
+        poll(scheduler, fake_clock, items=3)
+        polls += 1
+    assert polls <= (3600 + 60.0) / 7.2 + 1
+
+
+def test_quota_horizon_is_configurable():
+    quota = QuotaTracker(daily_quota=10_000, horizon=3600)
+    quota.seconds_until_reset = lambda: 86_400.0
+    # 2000 polls spread over an hour
+    assert quota.min_interval(["key"], "liveChatMessages.list") == 1.8
+    quota.horizon = 4 * 3600
+    assert quota.min_interval(["key"], "liveChatMessages.list") == 7.2
+
+
+def chat_item(sequence):
+    return {
+        "id": f"recorded-{sequence}",
+        "snippet": {"displayMessage": f"message {sequence}"},
+        "authorDetails": {"displayName": f"viewer{sequence}"},
+    }
+
+
+def test_listener_follows_server_interval_and_records_quota(monkeypatch, recorded_sleeps):
+    server = start_mock_server(replay=[
+        {"items": [chat_item(1)], "pollingIntervalMillis": 2000},
+        {"items": [chat_item(2), chat_item(3)], "pollingIntervalMillis": 4000},
+        {"items": [chat_item(4)], "pollingIntervalMillis": 3000},
+    ])
+    quota = QuotaTracker()
+    monkeypatch.setattr(main, "quota_tracker", quota)
+    monkeypatch.setattr(poll_scheduler, "quota_tracker", quota)
+    received = []
+    monkeypatch.setattr(main, "handle_message", lambda *message: received.append(message))
+    recorded_sleeps.limit = 3
+
+    keys = ApiKeyPool(["mock-key"], clients=YouTubeClientPool(endpoint=server.url))
+    try:
+        with pytest.raises(StopListening):
+            main.listen_to_live_chat(MOCK_CHAT_ID, keys, skip_first_batch=False)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert recorded_sleeps.delays == [2.0, 4.0, 3.0]
+    assert [text for _, text, _, _ in received] == [f"message {n}" for n in range(1, 5)]
+    assert server.requests["/liveChat/messages"] == 3
+    assert quota.used("mock-key") == 3 * 5
@@ -0,0 +1,39 @@
+from rate_limiter import DEFAULT_LIMITS, Limit, RateLimiter, limits_from_config
+
+
+def user_only_limiter(clock):
+    limits = {"user": {"regular": Limit(3, 0.0), "superchat": Limit(10, 0.0)}}
+    return RateLimiter(limits, clock=clock)
+
+
+def test_user_budget_is_spent(fake_clock):
+    limiter = user_only_limiter(fake_clock)
+    allowed = [limiter.acquire("!cmd", 0, "viewer", "regular").allowed for _ in range(4)]
+    assert allowed == [True, True, True, False]
+
+
+def test_tier_switch_does_not_refill_user_budget(fake_clock):
+    limiter = user_only_limiter(fake_clock)
+    for _ in range(3):
+        assert limiter.acquire("!cmd", 0, "viewer", "regular").allowed
+
+    # A superchat raises the cap but does not hand out a fresh allowance
+    assert not limiter.acquire("!cmd", 0, "viewer", "superchat").allowed
+    assert not limiter.acquire("!cmd", 0, "Viewer", "regular").allowed
+
+
+def test_tier_switch_clamps_to_smaller_capacity(fake_clock):
+    limiter = user_only_limiter(fake_clock)
+    assert limiter.acquire("!cmd", 0, "viewer", "superchat").allowed  # 9 left of 10
+    allowed = [limiter.acquire("!cmd", 0, "viewer", "regular").allowed for _ in range(4)]
+    assert allowed == [True, True, True, False]
+
+
+def test_limits_from_config_overrides_defaults():
+    limits = limits_from_config({
+        "user": {"regular": {"capacity": 1, "refill_per_second": 0.5}},
+        "tier": {"patreon": {"capacity": "bad"}},
+    })
+    assert limits["user"]["regular"] == Limit(1.0, 0.5)
+    assert limits["user"]["patreon"] == DEFAULT_LIMITS["user"]["patreon"]
+    assert limits["tier"]["patreon"] == DEFAULT_LIMITS["tier"]["patreon"]
@@ -0,0 +1,22 @@
+from speech_queue import SpeechQueue, spam_key
+
+
+def test_doubled_letters_are_kept():
+    assert spam_key("good") != spam_key("god")
+    assert spam_key("Good!") == spam_key("good")
+
+
+def test_spam_variants_merge():
+    assert spam_key("loooool") == spam_key("lol")
+    assert spam_key("lol!!!") == spam_key("lol")
+    assert spam_key("LOL") == spam_key("lol")
+
+
+def test_queue_coalesces_only_spam_variants():
+    queue = SpeechQueue()
+    queue.put("alice said: good", user="alice")
+    queue.put("bob said: god", user="bob")
+    queue.put("carol said: loooool", user="carol")
+    queue.put("dave said: lol!!!", user="dave")
+    assert len(queue) == 3
+    assert queue.counters["coalesced"] == 1
@@ -0,0 +1,28 @@
+import os
+import stat
+import sys
+
+import pytest
+
+import storage
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="POSIX permission bits")
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_write_keeps_existing_permissions(tmp_path):
+    path = tmp_path / "secrets.json"
+    path.write_text("{}", encoding="utf-8")
+    os.chmod(path, 0o644)
+    storage._write_json(path, {"api_key": "x"})
+    assert mode(path) == 0o644
+    assert storage._read_json(path, dict) == {"api_key": "x"}
+
+
+def test_new_file_gets_umask_mode(tmp_path):
+    path = tmp_path / "plaques.json"
+    storage._write_json(path, [])
+    assert mode(path) == 0o666 & ~storage._UMASK
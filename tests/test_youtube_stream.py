@@ -0,0 +1,62 @@
+import pytest
+
+import main
+from conftest import StopListening
+from mock_youtube_server import MOCK_CHAT_ID, start_mock_server
+from youtube_utils import ApiKeyPool, YouTubeClientPool
+
+REPLAY = [
+    {"items": [
+        {
+            "id": f"recorded-{sequence}",
+            "snippet": {"displayMessage": f"message {sequence}"},
+            "authorDetails": {"displayName": f"viewer{sequence}"},
+        }
+    ], "pollingIntervalMillis": 2000}
+    for sequence in range(3)
+]
+
+
+@pytest.fixture
+def listen(monkeypatch, recorded_sleeps):
+    """Run listen_to_live_chat_stream against a mock server until it starts polling."""
+    received = []
+    monkeypatch.setattr(main, "handle_message", lambda *message: received.append(message))
+    recorded_sleeps.limit = 1  # the poller's first sleep ends the test
+
+    def run(**server_options):
+        server = start_mock_server(replay=REPLAY, stream_interval=0.01, **server_options)
+        monkeypatch.setattr(main, "YOUTUBE_API_ENDPOINT", server.url)
+        keys = ApiKeyPool(["mock-key"], clients=YouTubeClientPool(endpoint=server.url))
+        try:
+            with pytest.raises(StopListening):
+                main.listen_to_live_chat_stream(MOCK_CHAT_ID, keys, skip_first_batch=False)
+        finally:
+            server.shutdown()
+            server.server_close()
+        return server, [text for _, text, _, _ in received]
+
+    return run
+
+
+def test_stream_delivers_messages_and_follows_page_tokens(listen):
+    server, texts = listen()
+    assert texts == ["message 0", "message 1", "message 2"]
+    # Every reconnect resumes after the last page; the empty reconnects hand
+    # over to the poller at the same token
+    assert server.page_tokens == [
+        ("/liveChat/messages/stream", None),
+        ("/liveChat/messages/stream", "3"),
+        ("/liveChat/messages/stream", "3"),
+        ("/liveChat/messages/stream", "3"),
+        ("/liveChat/messages", "3"),
+    ]
+
+
+def test_poller_takes_over_when_stream_is_unavailable(listen):
+    server, texts = listen(stream_status=404)
+    assert texts == ["message 0"]
+    assert server.page_tokens == [
+        ("/liveChat/messages/stream", None),
+        ("/liveChat/messages", None),
+    ]
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pygame
+
+CACHE_DIR = Path(__file__).resolve().parent / "audio" / "cache"
+DISK_LIMIT_BYTES = 256 * 1024 * 1024
+MEMORY_LIMIT_BYTES = 32 * 1024 * 1024
+
+
+def normalise_text(text):
+    """Collapse whitespace and case so trivially different repeats share audio."""
+    return " ".join(text.split()).casefold()
+
+
+def phrase_key(engine, voice, text):
+    digest = hashlib.sha256("\0".join((engine, voice, normalise_text(text))).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PhraseCache:
+    """
+    Content-addressed cache of rendered TTS clips.
+    Rendered wavs live in cache_dir named by phrase_key, evicted oldest-used
+    first past disk_limit; recently played clips also stay decoded in memory
+    up to memory_limit. Wav size is used as the decoded size of a clip.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, disk_limit=DISK_LIMIT_BYTES, memory_limit=MEMORY_LIMIT_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.disk_limit = disk_limit
+        self.memory_limit = memory_limit
+        self._lock = threading.Lock()
+        self._files = None  # key -> size, least recently used first
+        self._disk_bytes = 0
+        self._sounds = OrderedDict()  # key -> (Sound, size)
+        self._memory_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.wav"
+
+    def _load_index(self):
+        if self._files is not None:
+            return
+        files = []
+        if self.cache_dir.is_dir():
+            for path in self.cache_dir.glob("*.wav"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, path.stem, stat.st_size))
+        files.sort()
+        self._files = OrderedDict((key, size) for _, key, size in files)
+        self._disk_bytes = sum(self._files.values())
+
+    def _remember(self, key, sound, size):
+        self._sounds[key] = (sound, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_limit and len(self._sounds) > 1:
+            _, (_, evicted_size) = self._sounds.popitem(last=False)
+            self._memory_bytes -= evicted_size
+
+    def get(self, key):
+        """Return the cached Sound for key, or None on a miss."""
+        with self._lock:
+            entry = self._sounds.get(key)
+            if entry is not None:
+                self._sounds.move_to_end(key)
+                self._files.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+
+            self._load_index()
+            size = self._files.get(key)
+            if size is None:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                sound = pygame.mixer.Sound(str(path))
+                os.utime(path)  # keeps disk eviction order across restarts
+            except (OSError, pygame.error):
+                self._forget_file(key)
+                self.misses += 1
+                return None
+            self._files.move_to_end(key)
+            self._remember(key, sound, size)
+            self.disk_hits += 1
+            return sound
+
+    def put(self, key, wav_path):
+        """Move a freshly rendered wav into the cache and return it decoded."""
+        with self._lock:
+            self._load_index()
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            os.replace(wav_path, path)
+            size = path.stat().st_size
+            self._forget_file(key)
+            self._files[key] = size
+            self._disk_bytes += size
+            while self._disk_bytes > self.disk_limit and len(self._files) > 1:
+                oldest = next(iter(self._files))
+                self._forget_file(oldest)
+                try:
+                    self._path(oldest).unlink()
+                except OSError:
+                    pass
+
+            sound = pygame.mixer.Sound(str(path))
+            self._remember(key, sound, size)
+            return sound
+
+    def _forget_file(self, key):
+        self._disk_bytes -= self._files.pop(key, 0)
+        entry = self._sounds.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[1]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "clips": len(self._files or ()),
+            }
+
+
+phrase_cache = PhraseCache()
@@ -1,168 +1,424 @@
-import os
+import subprocess
 import traceback
+import uuid
 import pygame
 import time
 import threading
-import queue
 import pyttsx3
+import queue
 import atexit
+from collections import Counter
+from pathlib import Path
+
+from sound_board import TTS_CHANNEL, ensure_mixer
+from speech_queue import DEFAULT_TIER, SpeechQueue
+from tts_cache import phrase_cache, phrase_key
+
+TTS_DIR = Path(__file__).resolve().parent / "audio" / "tts"
+DEFAULT_VOICE = r'HKEY_LOCAL_MACHINE\SOFTWARE\Microsoft\Speech\Voices\Tokens\TTS_MS_EN-US_DAVID_11.0'
+READ_AHEAD = 3  # rendered clips waiting behind the one that is playing
+
+# Text waiting to be rendered (by priority), and rendered clips waiting to be played
+tts_queue = SpeechQueue()
+_ready_queue = queue.Queue(maxsize=READ_AHEAD)
+
+_engine = None
+_engine_voice = None
+
+TAIL_CHECK = 0.02  # seconds between checks for the mixer draining a finished clip
+
+# Chat batching: while TTS is busy, regular chat arriving within BATCH_WINDOW
+# is read as one summary, and the text is cut once the spoken backlog passes
+# LATENCY_BUDGET (dropped entirely past twice the budget).
+BATCH_WINDOW = 2.0  # seconds
+LATENCY_BUDGET = 20.0  # seconds of speech waiting ahead of new chat
+CHARS_PER_SECOND = 14.0  # rough speaking rate for backlog estimates
+SUMMARY_NAMES = 3
+UNBATCHED_TIERS = ("superchat", "patreon")
+
+
+class TtsPlayer:
+    """
+    Playback state of the TTS channel behind one condition variable.
+    The playing clip is waited on for exactly its remaining length, so the
+    worker sleeps until the clip ends or a control call notifies it; pause,
+    resume, skip and clear act on the mixer channel immediately.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.paused = False
+        self.generation = 0  # bumped by clear(): queued clips become stale
+        self.skips = 0  # bumped by skip(): the playing clip stops
+        self.channel = None
+        self.ends_at = None  # monotonic end of the playing clip
+        self.remaining = None  # seconds left of a clip paused mid-way
+
+    def play(self, generation, sound):
+        """Play sound to the end unless skipped or cleared; returns False if it was stale."""
+        with self.cond:
+            while self.paused and generation == self.generation:
+                self.cond.wait()
+            if generation != self.generation:
+                return False
+
+            skips = self.skips
+            self.channel = pygame.mixer.Channel(TTS_CHANNEL)
+            self.channel.play(sound)
+            self.ends_at = time.monotonic() + sound.get_length()
+            self.remaining = None
+            try:
+                while skips == self.skips and generation == self.generation:
+                    if self.paused:
+                        self.cond.wait()
+                        continue
+                    left = self.ends_at - time.monotonic()
+                    if left > 0:
+                        self.cond.wait(left)
+                    elif self.channel.get_busy():
+                        self.cond.wait(TAIL_CHECK)  # mixer buffer still draining
+                    else:
+                        break
+                else:
+                    self.channel.stop()
+            finally:
+                self.channel = None
+                self.ends_at = None
+                self.remaining = None
+            return True
+
+    def pause(self):
+        with self.cond:
+            if not self.paused and self.channel is not None:
+                self.channel.pause()
+                self.remaining = max(0.0, self.ends_at - time.monotonic())
+            self.paused = True
+            self.cond.notify_all()
+
+    def resume(self):
+        with self.cond:
+            if self.paused and self.channel is not None:
+                self.channel.unpause()
+                self.ends_at = time.monotonic() + (self.remaining or 0.0)
+                self.remaining = None
+            self.paused = False
+            self.cond.notify_all()
+
+    def skip(self):
+        with self.cond:
+            self.skips += 1
+            if self.channel is not None:
+                self.channel.stop()
+            self.cond.notify_all()
+
+    def clear(self):
+        with self.cond:
+            self.generation += 1
+            if self.channel is not None:
+                self.channel.stop()
+            self.cond.notify_all()
+
+
+player = TtsPlayer()
+
+
+def get_engine(voice=DEFAULT_VOICE):
+    """
+    Return the long-lived pyttsx3 engine, switching voice only when it changes.
+    Only the synthesis thread uses it.
+    """
+    global _engine, _engine_voice
+    if _engine is None:
+        _engine = pyttsx3.init()
+    if voice != _engine_voice:
+        _engine.setProperty("voice", voice)
+        _engine_voice = voice
+    return _engine
+
+
+def _render_newtts(text_to_say, wav_path):
+    engine = get_engine()
+    engine.save_to_file(text_to_say, str(wav_path))
+    engine.runAndWait()
+
+
+def _render_oldtts(text_to_say, wav_path):
+    # No shell, so quotes in chat messages can't break out of the command
+    subprocess.run(["say.exe", "-w", str(wav_path), f"[:PHONE ON]{text_to_say}"], check=False)
+
+
+def render(text, newtts=True):
+    """
+    Return text decoded as a Sound, or None on failure.
+    Phrases rendered before come from the phrase cache without synthesis.
+    """
+    ensure_mixer()  # shared with the sound board, never torn down
+    if newtts:
+        key = phrase_key("pyttsx3", DEFAULT_VOICE, text)
+    else:
+        key = phrase_key("say.exe", "dectalk", text)
+    sound = phrase_cache.get(key)
+    if sound is not None:
+        return sound
 
-# Initialize the TTS queue and state flags
-tts_queue = queue.Queue()
-stop_event = threading.Event()
-pause_event = threading.Event()
+    TTS_DIR.mkdir(parents=True, exist_ok=True)
+    wav_path = TTS_DIR / f"{uuid.uuid4().hex}.wav"
+    try:
+        if newtts:
+            _render_newtts(text, wav_path)
+        else:
+            _render_oldtts(text, wav_path)
+        if not wav_path.exists() or not wav_path.stat().st_size:
+            print(f"TTS produced no audio for: {text}")
+            return None
+        return phrase_cache.put(key, wav_path)
+    finally:
+        try:
+            wav_path.unlink()
+        except OSError:
+            pass
 
-def create_engine():
-    """Create a new pyttsx3 engine instance."""
-    engine = pyttsx3.init()
-    engine.setProperty("voice", 'HKEY_LOCAL_MACHINE\SOFTWARE\Microsoft\Speech\Voices\Tokens\TTS_MS_EN-US_DAVID_11.0')
-    return engine
 
-def _tts_worker():
-    """Worker thread to process TTS requests from the queue."""
+def _synth_worker():
+    """Render queued text ahead of playback, up to READ_AHEAD clips."""
     while True:
-        item = tts_queue.get()  # Get the next item from the queue
-        if item is None:  # Stop signal
-            break
-
-        text, newtts = item  # Unpack the text and newtts flag
+        item = tts_queue.get()
         try:
-            # Wait while paused, but allow stop to interrupt
-            while pause_event.is_set() and not stop_event.is_set():
-                time.sleep(0.1)
-
-            if stop_event.is_set():
+            if item is None:  # Queue closed
+                _ready_queue.put(None)
+                break
+
+            text, newtts = item.spoken_text(), item.newtts
+            generation = player.generation
+            try:
+                print(f"Rendering text: {text}, newtts={newtts}")
+                sound = render(text, newtts)
+            except Exception:
+                traceback.print_exc()
                 continue
+            if sound is not None and generation == player.generation:
+                _ready_queue.put((generation, text, sound))
+        finally:
+            tts_queue.task_done()
 
-            print(f"Processing text: {text}, newtts={newtts}")
-            
-            if newtts:
-                _play_newtts(text)
-            else:
-                _play_oldtts(text)
 
+def _playback_worker():
+    """Play rendered clips one after another on the reserved TTS channel."""
+    while True:
+        item = _ready_queue.get()
+        try:
+            if item is None:
+                break
+
+            generation, text, sound = item
+            if generation == player.generation:
+                print(f"Playing text: {text}")
+            player.play(generation, sound)
         except Exception as e:
             print(f"Error during TTS playback: {e}")
         finally:
-            tts_queue.task_done()
+            _ready_queue.task_done()
 
 
-def gotts(text, newtts=True):
-    """Add a TTS request to the queue with a 'newtts' flag."""
-    tts_queue.put((text, newtts))  # Queue the text with the newtts attribute
+def gotts(text, newtts=True, *, user=None, tier=DEFAULT_TIER):
+    """
+    Add a TTS request to the queue with a 'newtts' flag.
+    user and tier ("superchat", "patreon" or "regular") decide its place in line.
+    """
+    tts_queue.put(text, newtts, user, tier)
 
 
 def stop_tts_worker():
-    """Gracefully stop the TTS worker thread."""
-    tts_queue.put(None)  # Signal the thread to stop
-    _worker_thread.join()  # Wait for the worker thread to exit
+    """Gracefully stop the TTS worker threads."""
+    tts_queue.close()  # Signal the threads to stop
+    _synth_thread.join(timeout=5)
+    _playback_thread.join(timeout=5)
     print("TTS worker stopped gracefully.")
 
 
-def _play_oldtts(text_to_say, session="default"):
-    """Convert text to speech and play it without blocking."""
-    if stop_event.is_set():
-        return
-
-    wav_path = f"./audio/{session}.wav"
-
-    try:
-        os.makedirs("./audio", exist_ok=True)
-
-        # Run the speech synthesis command
-        command = f'say.exe -w "{wav_path}" "[:PHONE ON]{text_to_say}"'
-        os.system(command)
-
-        pygame.mixer.init()
-        pygame.mixer.music.load(wav_path)
-        pygame.mixer.music.play()
-
-        _wait_for_audio()
-
-    except Exception as e:
-        traceback.print_exc()
-
-def _play_newtts(text_to_say, session="default"):
-    """Convert text to speech and play it without blocking."""
-    if stop_event.is_set():
-        return
-
-    try:
-        engine = create_engine()
-        engine.say(text_to_say)
-        engine.runAndWait()  # Speak the text
-
-    except Exception as e:
-        traceback.print_exc()
-
-def _wait_for_audio():
-    """Wait for audio to finish playing and release the file."""
-    while pygame.mixer.music.get_busy():
-        if stop_event.is_set():
-            pygame.mixer.music.stop()
-            break
-        time.sleep(0.1)
-
-    pygame.mixer.quit()
-
 def skip_current_tts():
     """Stop the current audio without clearing the entire queue."""
-    stop_event.set()  # Signal to stop current audio
-    if pygame.mixer.get_init() and pygame.mixer.music.get_busy():
-        pygame.mixer.music.stop()  # Stop current audio if active
-    try:
-        engine = create_engine()
-        engine.stop()
-    except:
-        print("Error stopping Engine (this could be fine)")
-    stop_event.clear()  # Allow the next audio to play
+    player.skip()
 
 
 def pause_queue():
-    """Pause processing of the TTS queue without clearing items."""
-    pause_event.set()
+    """Pause TTS, including the clip that is playing, without clearing items."""
+    player.pause()
     return True
 
 
 def resume_queue():
-    """Resume processing of the TTS queue."""
-    pause_event.clear()
+    """Resume TTS where it was paused."""
+    player.resume()
     return False
 
 
 def toggle_pause():
     """Toggle pause state and return the new paused status."""
-    if pause_event.is_set():
-        resume_queue()
-    else:
-        pause_queue()
-    return pause_event.is_set()
+    with player.cond:
+        if player.paused:
+            return resume_queue()
+        return pause_queue()
 
 
 def is_paused() -> bool:
-    return pause_event.is_set()
+    return player.paused
+
+
+def backlog_seconds():
+    """Estimate how long until newly queued speech would start playing."""
+    seconds = tts_queue.pending_chars() / CHARS_PER_SECOND
+    with _ready_queue.mutex:
+        seconds += sum(item[2].get_length() for item in _ready_queue.queue if item)
+    with player.cond:
+        if player.remaining is not None:
+            seconds += player.remaining
+        elif player.ends_at is not None:
+            seconds += max(0.0, player.ends_at - time.monotonic())
+    return seconds
+
+
+class ChatBatcher:
+    """
+    Merge chat messages into summarised utterances when TTS can't keep up.
+    A message arriving while TTS is idle is spoken straight away; otherwise
+    messages collect for BATCH_WINDOW and are flushed as one utterance such
+    as "5 messages from A, B, C and 2 others", shortened or dropped as the
+    backlog grows so spoken latency stays bounded.
+    """
+
+    def __init__(self, window=BATCH_WINDOW, budget=LATENCY_BUDGET):
+        self.window = window
+        self.budget = budget
+        self._cond = threading.Condition()
+        self._pending = []
+        self._flush_at = None
+        self._thread = None
+        self.counters = Counter()
+
+    def add(self, display_name, text):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="tts-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append((display_name, text))
+            if self._flush_at is None:
+                idle = backlog_seconds() == 0 and not len(tts_queue)
+                self._flush_at = time.monotonic() + (0 if idle else self.window)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                while True:
+                    left = self._flush_at - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                batch, self._pending, self._flush_at = self._pending, [], None
+            try:
+                self._flush(batch)
+            except Exception as e:
+                print(f"Error flushing chat batch: {e}")
+
+    def _flush(self, batch):
+        backlog = backlog_seconds()
+        if backlog > 2 * self.budget:
+            self.counters["dropped"] += len(batch)
+            return
+        if len(batch) == 1:
+            display_name, text = batch[0]
+            if backlog > self.budget:
+                text = _shorten(text)
+                self.counters["shortened"] += 1
+            gotts(f"{display_name} said: {text}", user=display_name)
+            self.counters["spoken"] += 1
+            return
+
+        names = list(dict.fromkeys(name for name, _ in batch))
+        listed = ", ".join(names[:SUMMARY_NAMES])
+        if len(names) > SUMMARY_NAMES:
+            listed += f" and {len(names) - SUMMARY_NAMES} others"
+        summary = f"{len(batch)} messages from {listed}"
+        if backlog <= self.budget:
+            last_name, last_text = batch[-1]
+            summary += f". Latest, {last_name} said: {_shorten(last_text)}"
+        else:
+            self.counters["shortened"] += 1
+        gotts(summary)
+        self.counters["batches"] += 1
+        self.counters["batched_messages"] += len(batch)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.counters)
+            stats["pending"] = len(self._pending)
+            return stats
+
+
+def _shorten(text, words=12):
+    parts = text.split()
+    return text if len(parts) <= words else " ".join(parts[:words]) + "..."
+
+
+chat_batcher = ChatBatcher()
+
+
+def say_chat(display_name, text, tier=DEFAULT_TIER):
+    """
+    Read a chat message out. Superchat and patreon messages are queued as
+    they are; regular chat goes through the batcher.
+    """
+    if tier in UNBATCHED_TIERS:
+        gotts(f"{display_name} said: {text}", user=display_name, tier=tier)
+    else:
+        chat_batcher.add(display_name, text)
+
+
+def cache_stats():
+    return phrase_cache.stats()
+
+
+def queue_stats():
+    stats = tts_queue.stats()
+    stats["rendered_waiting"] = _ready_queue.qsize()
+    stats["backlog_seconds"] = round(backlog_seconds(), 1)
+    stats["batching"] = chat_batcher.stats()
+    return stats
+
+
+def _drain(q):
+    with q.mutex:
+        dropped = len(q.queue)
+        q.queue.clear()
+        q.unfinished_tasks -= dropped
+        if not q.unfinished_tasks:
+            q.all_tasks_done.notify_all()
+        q.not_full.notify_all()
 
 
 def clear_queue():
     """Stop current audio and clear the remaining TTS queue."""
-    stop_event.set()  # Signal to stop current audio
-    if pygame.mixer.get_init():
-        pygame.mixer.music.stop()  # Stop current audio if active
-    
-    # Clear the queue while keeping the worker thread alive
-    with tts_queue.mutex:
-        tts_queue.queue.clear()
-    
-    stop_event.clear()  # Allow the next audio to play
+    player.clear()  # Clips already being rendered are dropped when they finish
+    tts_queue.clear()
+    _drain(_ready_queue)
 
 
+def wait_until_idle():
+    """Block until everything queued so far has been rendered and played."""
+    tts_queue.join()
+    _ready_queue.join()
 
 
-# Start the TTS worker thread
-_worker_thread = threading.Thread(target=_tts_worker, daemon=True)
-_worker_thread.start()
+# Start the synthesis and playback threads
+_synth_thread = threading.Thread(target=_synth_worker, name="tts-synth", daemon=True)
+_synth_thread.start()
+_playback_thread = threading.Thread(target=_playback_worker, name="tts-playback", daemon=True)
+_playback_thread.start()
 
-# Register cleanup for the worker thread
+# Register cleanup for the worker threads
 atexit.register(stop_tts_worker)
 
 
@@ -173,12 +429,11 @@ if __name__ == "__main__":
     gotts("[:PHONE ON][mah<200,31>][rih<200,34>][teh<200,31>][pow<400,29>][ney<600,34>]")
     time.sleep(1)
     gotts("This is the third test message.")
-    
+
     # Clear the queue or stop TTS at any point
     # clear_queue()
 
     # Keep the script running to process the queue
-    while not tts_queue.empty():
-        time.sleep(0.5)
+    wait_until_idle()
 
     print("All messages processed. Exiting.")
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+from typing import Callable, Iterable, Iterator, Optional
+
+import requests
+
+from poll_scheduler import quota_tracker
+
+DEFAULT_ENDPOINT = "https://youtube.googleapis.com"
+STREAM_PATH = "/youtube/v3/liveChat/messages/stream"
+CONNECT_TIMEOUT = 10  # seconds
+READ_TIMEOUT = 90  # the server sends keep-alive responses well within this
+
+_decoder = json.JSONDecoder()
+
+
+class StreamUnavailable(Exception):
+    """The streaming endpoint rejected the request; polling should take over."""
+
+
+def iter_stream_responses(chunks: Iterable[str]) -> Iterator[dict]:
+    """
+    Decode LiveChatMessageListResponse objects from a server-streaming body.
+    The body is a JSON array written one element at a time ("[{...},{...}]"),
+    so objects are yielded as soon as each one is complete.
+    """
+    buffer = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip(" \t\r\n,[]")
+            if not buffer:
+                break
+            try:
+                response, end = _decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break  # incomplete object, wait for more data
+            buffer = buffer[end:]
+            if isinstance(response, dict):
+                yield response
+
+
+def stream_live_chat(
+    live_chat_id: str,
+    api_key: str,
+    on_response: Callable[[dict], None],
+    page_token: Optional[str] = None,
+    endpoint: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+) -> Optional[str]:
+    """
+    Hold one liveChatMessages.streamList connection open and hand every
+    response to on_response as it arrives. Returns the last nextPageToken
+    when the server ends the stream, so the caller can resume from it.
+    """
+    params = {
+        "liveChatId": live_chat_id,
+        "part": "id,snippet,authorDetails",
+        "key": api_key,
+    }
+    if page_token:
+        params["pageToken"] = page_token
+
+    url = f"{(endpoint or DEFAULT_ENDPOINT).rstrip('/')}{STREAM_PATH}"
+    http = session or requests
+    quota_tracker.record(api_key, "liveChatMessages.streamList")
+    with http.get(url, params=params, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+        if response.status_code in (400, 401, 403, 404, 405, 501):
+            raise StreamUnavailable(f"{response.status_code} {response.text[:200]}")
+        response.raise_for_status()
+        response.encoding = response.encoding or "utf-8"
+        for payload in iter_stream_responses(response.iter_content(chunk_size=None, decode_unicode=True)):
+            on_response(payload)
+            page_token = payload.get("nextPageToken") or page_token
+            if payload.get("offlineAt"):
+                break
+    return page_token
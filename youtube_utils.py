@@ -1,14 +1,119 @@
 from __future__ import annotations
 
-from typing import Dict
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, Dict, Sequence
 
-from googleapiclient.discovery import build
+import httplib2
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
 
+import probe_cache
+from poll_scheduler import quota_tracker
+
 
 TEST_VIDEO_ID = "dQw4w9WgXcQ"
 YOUTUBE_SERVICE = "youtube"
 YOUTUBE_VERSION = "v3"
+HTTP_TIMEOUT = 30  # seconds
+PROBE_TIMEOUT = 15  # seconds to wait for a startup probe before giving up on it
+
+# Set to e.g. http://127.0.0.1:8124 to talk to mock_youtube_server.py instead
+YOUTUBE_API_ENDPOINT = os.environ.get("YOUTUBE_API_ENDPOINT")
+
+_discovery_lock = threading.Lock()
+_discovery_document: Dict[str, Any] | None = None
+
+
+def discovery_document() -> Dict[str, Any] | None:
+    """Parse the discovery document bundled with googleapiclient once per process."""
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is None:
+            text = get_static_doc(YOUTUBE_SERVICE, YOUTUBE_VERSION)
+            if text is not None:
+                _discovery_document = json.loads(text)
+        return _discovery_document
+
+
+class YouTubeClientPool:
+    """
+    Build each API key's service object once and reuse it.
+    httplib2 transports are not thread-safe, so every thread gets one shared
+    transport plus its own key -> service map; within a thread switching keys
+    is a dict lookup.
+    """
+
+    def __init__(self, endpoint: str | None = YOUTUBE_API_ENDPOINT, timeout: int = HTTP_TIMEOUT):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def client(self, api_key: str):
+        clients = getattr(self._local, "clients", None)
+        if clients is None:
+            clients = self._local.clients = {}
+            self._local.http = httplib2.Http(timeout=self.timeout)
+        youtube = clients.get(api_key)
+        if youtube is None:
+            youtube = clients[api_key] = self._build(api_key)
+        return youtube
+
+    def _build(self, api_key: str):
+        client_options = {"api_endpoint": self.endpoint} if self.endpoint else None
+        document = discovery_document()
+        if document is None:
+            # No bundled document for this version; let build() fetch it
+            return build(
+                YOUTUBE_SERVICE,
+                YOUTUBE_VERSION,
+                developerKey=api_key,
+                http=self._local.http,
+                client_options=client_options,
+            )
+        return build_from_document(
+            document,
+            developerKey=api_key,
+            http=self._local.http,
+            client_options=client_options,
+        )
+
+
+client_pool = YouTubeClientPool()
+
+
+class ApiKeyPool:
+    """The configured API keys with a current key that rotates on quota errors."""
+
+    def __init__(self, api_keys: Sequence[str], clients: YouTubeClientPool = client_pool):
+        self.api_keys = list(api_keys)
+        self.clients = clients
+        self.index = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.api_keys)
+
+    @property
+    def current_key(self) -> str:
+        return self.api_keys[self.index]
+
+    def client(self, api_key: str | None = None):
+        return self.clients.client(api_key or self.current_key)
+
+    def rotate(self, failed_key: str | None = None) -> int:
+        """
+        Move to the next key and return its index. Passing the key that failed
+        keeps concurrent callers from rotating twice for the same error.
+        """
+        with self._lock:
+            if failed_key is None or failed_key == self.current_key:
+                self.index = (self.index + 1) % len(self.api_keys)
+            return self.index
 
 
 def verify_api_key(api_key: str | None) -> Dict[str, str | bool]:
@@ -17,7 +122,8 @@ def verify_api_key(api_key: str | None) -> Dict[str, str | bool]:
         return {"ok": False, "reason": "missing"}
 
     try:
-        youtube = build(YOUTUBE_SERVICE, YOUTUBE_VERSION, developerKey=api_key)
+        youtube = client_pool.client(api_key)
+        quota_tracker.record(api_key, "videos.list")
         youtube.videos().list(part="id", id=TEST_VIDEO_ID, maxResults=1).execute()
         return {"ok": True, "reason": ""}
     except HttpError as exc:
@@ -29,12 +135,35 @@ def verify_api_key(api_key: str | None) -> Dict[str, str | bool]:
         return {"ok": False, "reason": "error"}
 
 
-def verify_youtube_keys(secrets: dict) -> Dict[str, bool]:
-    """Check both configured API keys and return a status mapping."""
-    return {
-        "api_key": verify_api_key(secrets.get("api_key")),
-        "api_key_backup": verify_api_key(secrets.get("api_key_backup")),
-    }
+def verify_api_key_cached(api_key: str | None) -> Dict[str, str | bool]:
+    """verify_api_key backed by the short-TTL probe cache on disk."""
+    if not api_key:
+        return verify_api_key(api_key)
+    # Only a valid or rejected key is cached; quota and other errors clear up
+    # on their own, so the next check retries them
+    return probe_cache.cached(
+        "verify_key",
+        (api_key,),
+        lambda: verify_api_key(api_key),
+        should_cache=lambda status: status.get("reason") in ("", "invalid"),
+    )
+
+
+def verify_youtube_keys(secrets: dict, timeout: float = PROBE_TIMEOUT) -> Dict[str, Dict[str, str | bool]]:
+    """Check both configured API keys concurrently and return a status mapping."""
+    names = ("api_key", "api_key_backup")
+    executor = ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="verify-key")
+    futures = {name: executor.submit(verify_api_key_cached, secrets.get(name)) for name in names}
+    deadline = time.monotonic() + timeout
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            print(f"Timed out verifying YouTube {name}.")
+            results[name] = {"ok": False, "reason": "timeout"}
+    executor.shutdown(wait=False)
+    return results
 
 
 def _extract_reason(exc: HttpError) -> str: